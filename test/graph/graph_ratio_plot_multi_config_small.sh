@@ -14,6 +14,7 @@ sample_interval=1
 # Paths
 netcas_splitter_path="/home/chanseo/netCAS/open-cas-linux-netCAS/ocf/src/engine/netCAS_splitter.c"
 rebuild_script_path="/home/chanseo/netCAS/shell/rebuild_selector.sh"
+split_ratio_plot_script="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)/split_ratio_plot.py"
 
 # Create base output directory
 mkdir -p $base_output_dir
@@ -169,6 +170,9 @@ extract_split_ratio_data() {
             time_sec=$((time_sec + 1))
         done
     else
+        # Keep the raw metrics lines (RDMA bandwidth/latency per tick) for throughput_loss.py
+        echo "$dmesg_data" > "$output_dir/${test_id}_netcas_metrics.log"
+
         # Extract actual data from dmesg
         echo "$dmesg_data" | \
         sed -n 's/.*Mode: \([0-9]*\), Split Ratio: \([0-9.]*\)%.*/\1 \2/p' | \
@@ -186,107 +190,17 @@ extract_split_ratio_data() {
     echo "Mode data extracted to $mode_file"
 }
 
-# Function to generate split ratio and mode graphs
+# Function to generate split ratio and mode graphs for every test under a directory
+# All timelines are rendered by one renderer process instead of one python3 per test
 generate_split_ratio_graphs() {
-    local output_dir="$1"
-    local test_id="$2"
-    local split_ratio_file="$output_dir/${test_id}_split_ratio.txt"
-    local split_ratio_plot_png="$output_dir/${test_id}_split_ratio.png"
-    local python_script="$output_dir/${test_id}_split_ratio.py"
-
-    if [ ! -f "$split_ratio_file" ] || [ ! -s "$split_ratio_file" ]; then
-        echo "Error: Split ratio data file $split_ratio_file does not exist or is empty. Skipping graph generation."
-        return 1
-    fi
-
-    echo "Generating split ratio and mode graphs for $test_id..."
+    local results_dir="$1"
 
-    # Create a file with only mode changes for plotting
-    local mode_changes_file="$output_dir/${test_id}_mode_changes.txt"
-    local prev_mode=""
-    local time_index=0
+    echo "Generating split ratio and mode graphs under $results_dir..."
 
-    # Process the split ratio file to find mode changes
-    while IFS=' ' read -r mode split_ratio; do
-        if [ "$mode" != "$prev_mode" ] && [ -n "$prev_mode" ]; then
-            echo "$time_index $mode" >> "$mode_changes_file"
-        fi
-        prev_mode="$mode"
-        time_index=$((time_index + 1))
-    done < "$split_ratio_file"
-
-    # Create Python script for split ratio with mode changes
-    cat > "$python_script" << EOL
-import matplotlib.pyplot as plt
-import numpy as np
-import sys
-
-# Read split ratio data
-try:
-    data = np.loadtxt('$split_ratio_file')
-    time_indices = data[:, 0]  # Time in seconds
-    modes = data[:, 1]         # Mode values
-    split_ratios = data[:, 2]  # Split ratio values
-except:
-    print("Error: Could not read split ratio data")
-    sys.exit(1)
-
-# Find mode changes from the data
-mode_changes_x = []
-mode_changes_y = []
-prev_mode = None
-for i, (time_val, mode_val) in enumerate(zip(time_indices, modes)):
-    if prev_mode is not None and mode_val != prev_mode:
-        mode_changes_x.append(time_val)
-        mode_changes_y.append(mode_val)
-    prev_mode = mode_val
-
-# Create the plot
-fig, ax1 = plt.subplots(figsize=(12, 8))
-
-# Plot split ratio
-ax1.plot(time_indices, split_ratios, 'b-', linewidth=2, label='Split Ratio (%)')
-ax1.set_xlabel('Time (seconds)')
-ax1.set_ylabel('Split Ratio (%)', color='b')
-ax1.tick_params(axis='y', labelcolor='b')
-ax1.grid(True, alpha=0.3)
-
-# Add vertical dashed lines for mode changes
-for i, (x, y) in enumerate(zip(mode_changes_x, mode_changes_y)):
-    ax1.axvline(x=x, color='red', linestyle='--', linewidth=2, alpha=0.7)
-    ax1.text(x, max(split_ratios) * 0.95, f'Mode {y}', rotation=90, 
-             verticalalignment='top', horizontalalignment='right', 
-             color='red', fontsize=10, fontweight='bold')
-
-# Create second y-axis for mode changes
-ax2 = ax1.twinx()
-if mode_changes_x:
-    ax2.scatter(mode_changes_x, mode_changes_y, color='red', s=100, 
-                label='Mode Changes', zorder=5)
-ax2.set_ylabel('Mode', color='r')
-ax2.tick_params(axis='y', labelcolor='r')
-ax2.set_ylim(0, max(mode_changes_y) + 1 if mode_changes_y else 1)
-
-# Set title and legend
-plt.title('Split Ratio and Mode Changes - $test_id', fontsize=14, fontweight='bold')
-ax1.legend(loc='upper left')
-if mode_changes_x:
-    ax2.legend(loc='upper right')
-
-# Adjust layout and save
-plt.tight_layout()
-plt.savefig('$split_ratio_plot_png', dpi=300, bbox_inches='tight')
-plt.close()
-
-print("Split ratio graph saved to $split_ratio_plot_png")
-EOL
-    
-    # Run Python script
-    python3 "$python_script"
-    if [ $? -eq 0 ]; then
-        echo "Split ratio graph saved to $split_ratio_plot_png"
+    if python3 "$split_ratio_plot_script" "$results_dir" --mode-changes; then
+        echo "Split ratio graphs saved under $results_dir"
     else
-        echo "Error: Failed to generate split ratio graph"
+        echo "Error: Failed to generate some split ratio graphs"
     fi
 }
 
@@ -468,9 +382,6 @@ run_single_test() {
     # Generate FIO performance graphs (bandwidth and latency)
     generate_fio_graphs "$output_dir" "$test_id" "$contention_start_time"
     
-    # Generate split ratio and mode graphs
-    generate_split_ratio_graphs "$output_dir" "$test_id"
-    
     # Record results in summary file
     echo "$test_id,$io_depth,$num_jobs,$iops_value" >> "$results_file"
     
@@ -499,6 +410,10 @@ echo "test_id,io_depth,num_jobs,iops" > "$base_output_dir/results_summary.txt"
 total_tests=$((${#iodepths[@]} * ${#jobnums[@]}))
 current_test=0
 
+# If the sweep fails or is interrupted, still render the timelines of the finished tests
+trap 'generate_split_ratio_graphs "$base_output_dir"' EXIT
+trap 'exit 130' INT TERM
+
 # Loop through all combinations
 for device in "${devices[@]}"; do
     for iodepth in "${iodepths[@]}"; do
@@ -519,6 +434,10 @@ done
 # Restore original splitter file
 restore_splitter
 
+# Generate split ratio and mode graphs for all tests in one pass
+trap - EXIT INT TERM
+generate_split_ratio_graphs "$base_output_dir"
+
 echo ""
 echo "=========================================="
 echo "All tests completed!"
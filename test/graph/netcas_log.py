@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+netCAS Kernel Log Patterns
+Regular expressions for the netCAS lines printed to the kernel log, shared by
+the analysis tools and the exporter (standard library only)
+"""
+
+import re
+
+# netCAS: Current metrics - RDMA: 2149, RDMA_Lat: 351 (baseline: 177), IOPS: 66160, BW_Drop: 9%,
+#         Lat_Inc: 98%, Mode: 3, Split Ratio: 51.44%
+NETCAS_METRICS_PATTERN = re.compile(
+    r'netCAS: Current metrics - RDMA: (?P<rdma>\d+), RDMA_Lat: (?P<lat>\d+) \(baseline: (?P<lat_base>\d+)\), '
+    r'IOPS: (?P<iops>\d+), BW_Drop: (?P<bw_drop>-?\d+)%, Lat_Inc: (?P<lat_inc>-?\d+)%, '
+    r'Mode: (?P<mode>\d+), Split Ratio: (?P<ratio>[\d.]+)%')
+
+# netCAS: Mode changed from STABLE to CONGESTION (BW_Drop: 9%, Lat_Inc: 7%)
+NETCAS_MODE_CHANGE_PATTERN = re.compile(r'netCAS: Mode changed from (?P<old>[A-Z]+) to (?P<new>[A-Z]+)')
+
+# [RDMA-METRICS] Throughput: 2149 MB/s | Avg Latency: 351 us
+RDMA_METRICS_PATTERN = re.compile(r'\[RDMA-METRICS\] Throughput: (?P<tput>\d+) MB/s \| Avg Latency: (?P<lat>\d+) us')
+
+# [ 1234.567890] prefix of dmesg lines
+KMSG_TIMESTAMP_PATTERN = re.compile(r'^\[\s*(?P<ts>\d+\.\d+)\]')
+
+MODE_NAMES = {0: 'IDLE', 1: 'WARMUP', 2: 'STABLE', 3: 'CONGESTION', 4: 'FAILURE'}
+STABLE_MODE = 2
+CONGESTION_MODE = 3
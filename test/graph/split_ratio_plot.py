@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+netCAS Split Ratio Timeline Renderer
+Plots split ratio and mode changes for many ${test_id}_split_ratio.txt files
+in a single process, rendering figures in parallel
+"""
+
+import os
+import sys
+import argparse
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+SPLIT_RATIO_SUFFIX = '_split_ratio.txt'
+
+
+def load_split_ratio(path):
+    """Load a "time mode split_ratio" timeline, returning (times, modes, ratios)"""
+    data = np.loadtxt(path, ndmin=2)
+    if data.shape[0] == 0:
+        raise ValueError(f"{path} is empty")
+    if data.shape[1] == 2:
+        # Older extractors wrote "mode split_ratio" only, one sample per 0.1s
+        return np.arange(len(data)) * 0.1, data[:, 0].astype(int), data[:, 1]
+    return data[:, 0], data[:, 1].astype(int), data[:, 2]
+
+
+def find_mode_changes(times, modes):
+    """Return (times, new_modes) for every sample where the mode differs from the previous one"""
+    changes = np.flatnonzero(modes[1:] != modes[:-1]) + 1
+    return times[changes], modes[changes]
+
+
+def test_id_for(path):
+    name = Path(path).name
+    return name[:-len(SPLIT_RATIO_SUFFIX)] if name.endswith(SPLIT_RATIO_SUFFIX) else Path(path).stem
+
+
+def render_split_ratio(path, output=None, ylim=None, dpi=300, write_changes=False):
+    """Render one split ratio timeline to PNG, returning the output path"""
+    path = Path(path)
+    test_id = test_id_for(path)
+    output = Path(output) if output else path.with_name(f"{test_id}_split_ratio.png")
+
+    times, modes, ratios = load_split_ratio(path)
+    change_x, change_y = find_mode_changes(times, modes)
+
+    if write_changes:
+        np.savetxt(path.with_name(f"{test_id}_mode_changes.txt"),
+                   np.column_stack([change_x, change_y]), fmt=['%.1f', '%d'])
+
+    fig, ax1 = plt.subplots(figsize=(12, 8))
+
+    ax1.plot(times, ratios, 'b-', linewidth=2, label='Split Ratio (%)')
+    ax1.set_xlabel('Time (seconds)')
+    ax1.set_ylabel('Split Ratio (%)', color='b')
+    ax1.tick_params(axis='y', labelcolor='b')
+    if ylim:
+        ax1.set_ylim(*ylim)
+    ax1.grid(True, alpha=0.3)
+
+    # Dashed line and label at every mode change
+    label_y = ratios.max() * 0.95
+    for x, y in zip(change_x, change_y):
+        ax1.axvline(x=x, color='red', linestyle='--', linewidth=2, alpha=0.7)
+        ax1.text(x, label_y, f'Mode {y}', rotation=90,
+                 verticalalignment='top', horizontalalignment='right',
+                 color='red', fontsize=10, fontweight='bold')
+
+    ax2 = ax1.twinx()
+    if len(change_x):
+        ax2.scatter(change_x, change_y, color='red', s=100, label='Mode Changes', zorder=5)
+    ax2.set_ylabel('Mode', color='r')
+    ax2.tick_params(axis='y', labelcolor='r')
+    ax2.set_ylim(0, change_y.max() + 1 if len(change_y) else 1)
+
+    resolution = np.median(np.diff(times)) if len(times) > 1 else 0
+    title = f'Split Ratio and Mode Changes - {test_id}'
+    if resolution:
+        title += f' ({resolution:g}s resolution)'
+    plt.title(title, fontsize=14, fontweight='bold')
+    ax1.legend(loc='upper left')
+    if len(change_x):
+        ax2.legend(loc='upper right')
+
+    plt.tight_layout()
+    plt.savefig(output, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+    return output
+
+
+def collect_inputs(inputs):
+    """Expand directories into the split ratio files found beneath them"""
+    paths = []
+    for item in inputs:
+        item = Path(item)
+        if item.is_dir():
+            paths.extend(sorted(item.rglob(f'*{SPLIT_RATIO_SUFFIX}')))
+        else:
+            paths.append(item)
+    return [p for p in paths if p.is_file() and p.stat().st_size > 0]
+
+
+def render_all(paths, jobs=None, **kwargs):
+    """Render every timeline, using a process pool when there is more than one
+
+    Returns a list of (path, output_or_None, error_or_None) in input order.
+    """
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    jobs = max(1, min(jobs, len(paths)))
+
+    results = {}
+    if jobs == 1:
+        for path in paths:
+            try:
+                results[path] = (render_split_ratio(path, **kwargs), None)
+            except Exception as e:
+                results[path] = (None, e)
+    else:
+        # Workers are forked after matplotlib is imported, so no figure pays the import
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context('fork')) as pool:
+            futures = {pool.submit(render_split_ratio, path, **kwargs): path for path in paths}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    results[path] = (future.result(), None)
+                except Exception as e:
+                    results[path] = (None, e)
+
+    return [(path, *results[path]) for path in paths]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render netCAS split ratio and mode timelines')
+    parser.add_argument('inputs', nargs='+', help='*_split_ratio.txt files or directories to search')
+    parser.add_argument('-o', '--output', help='Output PNG (only with a single input file)')
+    parser.add_argument('-j', '--jobs', type=int, help='Parallel render processes (default: CPU count)')
+    parser.add_argument('--dpi', type=int, default=300, help='Output resolution (default: 300)')
+    parser.add_argument('--ylim', type=float, nargs=2, metavar=('MIN', 'MAX'), help='Fix the split ratio axis range')
+    parser.add_argument('--mode-changes', action='store_true',
+                        help='Also write ${test_id}_mode_changes.txt next to each input')
+
+    args = parser.parse_args()
+
+    paths = collect_inputs(args.inputs)
+    if not paths:
+        print("Error: No non-empty split ratio files found")
+        return 1
+    if args.output and len(paths) > 1:
+        print("Error: --output can only be used with a single input file")
+        return 1
+
+    kwargs = {'ylim': args.ylim, 'dpi': args.dpi, 'write_changes': args.mode_changes}
+    if args.output:
+        kwargs['output'] = args.output
+
+    failed = 0
+    for path, output, error in render_all(paths, args.jobs, **kwargs):
+        if error:
+            print(f"Error: Failed to generate split ratio graph for {path}: {error}")
+            failed += 1
+        else:
+            print(f"Split ratio graph saved to {output}")
+
+    print(f"Rendered {len(paths) - failed}/{len(paths)} split ratio graphs")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+netCAS Split Ratio Stability Analysis
+Quantifies how the split ratio control loop behaves: settling time, overshoot,
+oscillation, steady-state error against the ideal ratio and time spent per mode
+"""
+
+import re
+import sys
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from netcas_log import MODE_NAMES, STABLE_MODE
+from split_ratio_plot import SPLIT_RATIO_SUFFIX, load_split_ratio, test_id_for
+
+RATIO_DATA_NAME = 'ratio_data.dat'
+# query_load_admit is logged once per second on a 0..10000 scale
+RATIO_DATA_INTERVAL = 1.0
+RATIO_DATA_SCALE = 100.0
+CONFIG_PATTERN = re.compile(r'iodepth(\d+)_jobs(\d+)')
+
+
+def load_ratio_data(path, interval=RATIO_DATA_INTERVAL):
+    """Load a "sample ratio" ratio_data.dat file, returning (times, None, ratios in %)"""
+    data = np.loadtxt(path, ndmin=2)
+    if data.shape[0] == 0:
+        raise ValueError(f"{path} is empty")
+    times = (data[:, 0] - data[0, 0]) * interval
+    return times, None, data[:, 1] / RATIO_DATA_SCALE
+
+
+def load_run(path, interval=RATIO_DATA_INTERVAL):
+    """Load any supported timeline, returning (run_id, times, modes, ratios)"""
+    path = Path(path)
+    if path.name == RATIO_DATA_NAME:
+        return (path.parent.name,) + load_ratio_data(path, interval)
+    return (test_id_for(path),) + load_split_ratio(path)
+
+
+def load_iops_lookup(path):
+    """Read find_ideal_ratio.sh results into {(iodepth, jobs): (cache IOPS, backing IOPS)}"""
+    df = pd.read_csv(path)
+    return {(int(d), int(j)): (float(c), float(b))
+            for d, j, c, b in zip(df['IOdepth'], df['Jobnum'], df['Caching IOPS'], df['Backing IOPS'])}
+
+
+def lookup_for(run_id, lookup):
+    """Return the lookup entry matching the iodepth/jobs in a test id, or None"""
+    match = CONFIG_PATTERN.search(run_id)
+    if not match or not lookup:
+        return None
+    return lookup.get((int(match.group(1)), int(match.group(2))))
+
+
+def ideal_for(run_id, lookup):
+    entry = lookup_for(run_id, lookup)
+    if entry is None:
+        return np.nan
+    cache, backing = entry
+    return 100.0 * cache / (cache + backing)
+
+
+def segment_bounds(modes, n):
+    """Split a run into [start, end) index ranges of constant mode"""
+    if modes is None:
+        return np.array([0]), np.array([n])
+    starts = np.concatenate(([0], np.flatnonzero(modes[1:] != modes[:-1]) + 1))
+    ends = np.append(starts[1:], n)
+    return starts, ends
+
+
+def analyze_segment(times, ratios, band, tail):
+    """Step response of one constant-mode segment
+
+    The segment's steady value is the mean of its last `tail` fraction. It
+    settles once it stays within `band` percentage points of that value, and
+    overshoot is the largest excursion past it in the step direction, as a
+    percentage of the step size.
+    """
+    n = len(ratios)
+    steady = ratios[-max(1, int(n * tail)):].mean()
+    outside = np.flatnonzero(np.abs(ratios - steady) > band)
+    if len(outside) == 0:
+        settle_idx = 0
+    elif outside[-1] == n - 1:
+        settle_idx = None
+    else:
+        settle_idx = outside[-1] + 1
+
+    step = steady - ratios[0]
+    if abs(step) <= band:
+        overshoot = 0.0
+    else:
+        overshoot = max(((ratios - steady) * np.sign(step)).max(), 0.0) / abs(step) * 100.0
+
+    settling_time = np.nan if settle_idx is None else times[settle_idx] - times[0]
+    return steady, settling_time, overshoot, settle_idx
+
+
+def dominant_oscillation(residual, dt):
+    """Return (frequency Hz, amplitude) of the strongest non-DC FFT component"""
+    if len(residual) < 4 or dt <= 0:
+        return np.nan, 0.0
+    spectrum = np.abs(np.fft.rfft(residual - residual.mean()))
+    freqs = np.fft.rfftfreq(len(residual), dt)
+    peak = np.argmax(spectrum[1:]) + 1
+    return freqs[peak], 2.0 * spectrum[peak] / len(residual)
+
+
+def analyze_run(run_id, times, modes, ratios, ideal=np.nan, band=2.0, tail=0.2):
+    """Compute the stability metrics for one run"""
+    starts, ends = segment_bounds(modes, len(ratios))
+    steady_values = np.empty(len(starts))
+    settling_times = np.empty(len(starts))
+    overshoots = np.empty(len(starts))
+    settled = np.zeros(len(ratios), dtype=bool)
+
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        steady, settling, overshoot, settle_idx = analyze_segment(times[start:end], ratios[start:end], band, tail)
+        steady_values[i], settling_times[i], overshoots[i] = steady, settling, overshoot
+        if settle_idx is not None:
+            settled[start + settle_idx:end] = True
+
+    # Oscillation around each segment's own steady value, so mode steps do not dominate the spectrum
+    residual = ratios - np.repeat(steady_values, ends - starts)
+    dt = float(np.median(np.diff(times))) if len(times) > 1 else 0.0
+    osc_freq, osc_amp = dominant_oscillation(residual, dt)
+
+    # Steady-state error is judged where the lookup ratio applies: settled STABLE samples
+    reference = settled if modes is None else settled & (modes == STABLE_MODE)
+    if reference.any() and not np.isnan(ideal):
+        error = ratios[reference] - ideal
+        ss_error, ss_rms = error.mean(), np.sqrt(np.mean(error ** 2))
+    else:
+        ss_error = ss_rms = np.nan
+
+    result = {
+        'run': run_id,
+        'samples': len(ratios),
+        'duration_s': times[-1] - times[0],
+        'mode_changes': len(starts) - 1,
+        'mean_ratio': ratios.mean(),
+        'ideal_ratio': ideal,
+        'settling_mean_s': np.nanmean(settling_times) if not np.isnan(settling_times).all() else np.nan,
+        'settling_max_s': np.nanmax(settling_times) if not np.isnan(settling_times).all() else np.nan,
+        'unsettled_segments': int(np.isnan(settling_times).sum()),
+        'overshoot_max_pct': overshoots.max(),
+        'osc_freq_hz': osc_freq,
+        'osc_amplitude': osc_amp,
+        'settled_std': residual[settled].std() if settled.any() else np.nan,
+        'ss_error': ss_error,
+        'ss_rms_error': ss_rms,
+    }
+
+    if modes is not None:
+        counts = np.bincount(modes.clip(min=0), minlength=len(MODE_NAMES))
+        for mode, name in MODE_NAMES.items():
+            result[f'time_{name.lower()}'] = counts[mode] / len(modes)
+    return result
+
+
+def collect_inputs(inputs):
+    """Expand directories into the split ratio and ratio_data files beneath them"""
+    paths = []
+    for item in inputs:
+        item = Path(item)
+        if item.is_dir():
+            found = set(item.rglob(f'*{SPLIT_RATIO_SUFFIX}')) | set(item.rglob(RATIO_DATA_NAME))
+            paths.extend(sorted(found))
+        else:
+            paths.append(item)
+    return [p for p in paths if p.is_file() and p.stat().st_size > 0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Analyze netCAS split ratio stability per run and across a sweep')
+    parser.add_argument('inputs', nargs='+', help='*_split_ratio.txt / ratio_data.dat files or directories to search')
+    parser.add_argument('--ideal', type=float, help='Ideal split ratio in %% for every run')
+    parser.add_argument('--lookup', help='find_ideal_ratio.sh CSV to take the ideal ratio per iodepth/jobs from')
+    parser.add_argument('--band', type=float, default=2.0, help='Settling band in percentage points (default: 2)')
+    parser.add_argument('--tail', type=float, default=0.2,
+                        help='Fraction of each segment used as its steady value (default: 0.2)')
+    parser.add_argument('--interval', type=float, default=RATIO_DATA_INTERVAL,
+                        help='Seconds between ratio_data.dat samples (default: 1)')
+    parser.add_argument('--osc-threshold', type=float, default=2.0,
+                        help='Oscillation amplitude in percentage points that marks a run unstable (default: 2)')
+    parser.add_argument('-o', '--output', help='Write per-run metrics to this CSV file')
+
+    args = parser.parse_args()
+
+    paths = collect_inputs(args.inputs)
+    if not paths:
+        print("Error: No non-empty split ratio files found")
+        return 1
+
+    lookup = None
+    if args.lookup:
+        try:
+            lookup = load_iops_lookup(args.lookup)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Error: Could not read ideal ratio lookup {args.lookup}: {e}")
+            return 1
+
+    rows = []
+    for path in paths:
+        try:
+            run_id, times, modes, ratios = load_run(path, args.interval)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Skipping {path}: {e}")
+            continue
+        ideal = args.ideal if args.ideal is not None else ideal_for(run_id, lookup)
+        rows.append(analyze_run(run_id, times, modes, ratios, ideal, args.band, args.tail))
+
+    if not rows:
+        print("Error: No runs could be analyzed")
+        return 1
+
+    df = pd.DataFrame(rows)
+    df['unstable'] = (df['osc_amplitude'] > args.osc_threshold) | (df['unsettled_segments'] > 0)
+
+    with pd.option_context('display.max_columns', None, 'display.width', 200, 'display.float_format', '{:.3f}'.format):
+        print("Per-run stability metrics:")
+        print(df.to_string(index=False))
+        if len(df) > 1:
+            print("\nAcross the sweep:")
+            print(df.drop(columns=['run', 'unstable']).agg(['mean', 'min', 'max']).T.to_string())
+
+    unstable = df.loc[df['unstable'], 'run'].tolist()
+    if unstable:
+        print(f"\nUnstable runs ({len(unstable)}/{len(df)}): {', '.join(unstable)}")
+
+    if args.output:
+        df.to_csv(args.output, index=False)
+        print(f"Stability metrics saved to {args.output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
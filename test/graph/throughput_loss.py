@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+netCAS Throughput Loss Attribution
+Compares measured fio IOPS with the theoretical optimum of the cache/backing
+split under the current RDMA capacity, window by window, and attributes the
+shortfall to detection lag, split ratio error and splitter overhead
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from netcas_log import NETCAS_METRICS_PATTERN, KMSG_TIMESTAMP_PATTERN, CONGESTION_MODE
+from split_ratio_plot import SPLIT_RATIO_SUFFIX, load_split_ratio
+from split_ratio_stability import load_iops_lookup, lookup_for
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'rdma_trace'))
+from rdma_trace import RDMATrace
+
+NETCAS_METRICS_SUFFIX = '_netcas_metrics.log'
+METRICS_INTERVAL = 0.1
+# Bandwidth drop at which netCAS is expected to enter CONGESTION
+CONGESTION_BW_DROP = 0.09
+
+
+def load_netcas_metrics(path, interval=METRICS_INTERVAL):
+    """Parse netCAS "Current metrics" kernel log lines into a DataFrame, one row per control tick
+
+    Times are the dmesg timestamps relative to the first line; a line without
+    one is placed `interval` after the line before it.
+    """
+    rows, stamps = [], []
+    with open(path, 'r', errors='replace') as f:
+        for line in f:
+            m = NETCAS_METRICS_PATTERN.search(line)
+            if m:
+                rows.append(m.groupdict())
+                ts = KMSG_TIMESTAMP_PATTERN.match(line)
+                stamps.append(float(ts.group('ts')) if ts else np.nan)
+    if not rows:
+        raise ValueError(f"{path}: no netCAS metrics lines found")
+    df = pd.DataFrame(rows).astype({'rdma': float, 'lat': float, 'lat_base': float, 'iops': float,
+                                    'bw_drop': float, 'lat_inc': float, 'mode': int, 'ratio': float})
+    # Offset of each timestamp from the tick count, carried over lines that have none
+    ticks = np.arange(len(df)) * interval
+    offset = pd.Series(np.array(stamps) - ticks).ffill().bfill().fillna(0.0).values
+    times = ticks + offset
+    df.insert(0, 'time', times - times[0])
+    return df
+
+
+def load_fio_iops(paths, block_kib):
+    """Load fio bandwidth logs (time ms, KiB/s, ...) as (times in s, job index, IOPS) arrays"""
+    times, jobs, iops = [], [], []
+    for job, path in enumerate(paths):
+        data = np.loadtxt(path, delimiter=',', ndmin=2, usecols=(0, 1))
+        times.append(data[:, 0] / 1000.0)
+        jobs.append(np.full(len(data), job))
+        iops.append(data[:, 1] / block_kib)
+    return np.concatenate(times), np.concatenate(jobs), np.concatenate(iops)
+
+
+def window_mean(times, values, n_windows, window, groups=None):
+    """Mean of values per window (and per group, summed over groups), NaN for empty windows"""
+    idx = (times // window).astype(int)
+    keep = (idx >= 0) & (idx < n_windows)
+    idx, values = idx[keep], values[keep]
+    if groups is None:
+        sums = np.bincount(idx, weights=values, minlength=n_windows)
+        counts = np.bincount(idx, minlength=n_windows)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, sums / counts, np.nan)
+
+    # Average each job within the window first, then add jobs up
+    groups = groups[keep]
+    n_groups = groups.max() + 1 if len(groups) else 1
+    flat = groups * n_windows + idx
+    sums = np.bincount(flat, weights=values, minlength=n_groups * n_windows).reshape(n_groups, n_windows)
+    counts = np.bincount(flat, minlength=n_groups * n_windows).reshape(n_groups, n_windows)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.where(counts > 0, sums / counts, 0.0)
+    return np.where(counts.any(axis=0), means.sum(axis=0), np.nan)
+
+
+def split_iops(ratio, cache_iops, backing_iops):
+    """IOPS of a split sending `ratio` (0..1) of requests to the cache
+
+    Each device saturates independently, so the split runs at the rate that
+    saturates the first one: min(C / r, B / (1 - r)), which peaks at C + B
+    when r = C / (C + B).
+    """
+    with np.errstate(divide='ignore'):
+        via_cache = np.where(ratio > 0, cache_iops / ratio, np.inf)
+        via_backing = np.where(ratio < 1, backing_iops / (1.0 - ratio), np.inf)
+    return np.minimum(via_cache, via_backing)
+
+
+def estimate_detection_lag(times, rdma, modes, baseline, default):
+    """Median delay from an RDMA bandwidth drop to the next switch into CONGESTION mode"""
+    dropped = rdma < baseline * (1.0 - CONGESTION_BW_DROP)
+    congested = modes == CONGESTION_MODE
+    drop_starts = np.flatnonzero(dropped[1:] & ~dropped[:-1]) + 1
+    congestion_starts = np.flatnonzero(congested[1:] & ~congested[:-1]) + 1
+    if not len(drop_starts) or not len(congestion_starts):
+        return default
+
+    nxt = np.searchsorted(congestion_starts, drop_starts)
+    valid = nxt < len(congestion_starts)
+    if not valid.any():
+        return default
+    return float(np.median(times[congestion_starts[nxt[valid]]] - times[drop_starts[valid]]))
+
+
+class RunAttribution:
+    """Loads one test's timelines and attributes its throughput loss per window"""
+
+    def __init__(self, run_dir, test_id, args):
+        self.run_dir = Path(run_dir)
+        self.test_id = test_id
+        self.args = args
+
+    def load_control(self):
+        """Return (times, rdma MB/s, modes, ratios %) on the control loop tick"""
+        metrics_file = self.run_dir / f"{self.test_id}{NETCAS_METRICS_SUFFIX}"
+        if metrics_file.exists():
+            df = load_netcas_metrics(metrics_file)
+            return df['time'].values, df['rdma'].values, df['mode'].values, df['ratio'].values
+
+        ratio_file = self.run_dir / f"{self.test_id}{SPLIT_RATIO_SUFFIX}"
+        if not self.args.rdma:
+            raise ValueError(f"no {metrics_file.name}; pass --rdma with a trace or dmesg log for {ratio_file.name}")
+        times, modes, ratios = load_split_ratio(ratio_file)
+        trace = load_rdma(self.args.rdma)
+        rdma = np.interp(times, trace.times, trace.throughput.astype(float))
+        return times, rdma, modes, ratios
+
+    def fio_logs(self):
+        logs = sorted(self.run_dir.glob(f"{self.test_id}_bw.*.log"))
+        if not logs:
+            agg = self.run_dir / f"{self.test_id}_bw_agg.log"
+            if agg.exists():
+                return [agg]
+        return logs
+
+    def device_iops(self):
+        if self.args.cache_iops and self.args.backing_iops:
+            return self.args.cache_iops, self.args.backing_iops
+        entry = lookup_for(self.test_id, self.args.lookup_table)
+        if entry is None:
+            raise ValueError("no cache/backing IOPS: pass --lookup or --cache-iops/--backing-iops")
+        return entry
+
+    def analyze(self):
+        """Return a per-window DataFrame of optimal, lag-limited, predicted and measured IOPS"""
+        args = self.args
+        times, rdma, modes, ratios = self.load_control()
+        logs = self.fio_logs()
+        if not logs:
+            raise ValueError("no fio bandwidth logs")
+        cache_iops, backing_iops = self.device_iops()
+
+        fio_t, fio_job, fio_iops = load_fio_iops(logs, args.bs)
+        fio_t = fio_t + args.offset
+        n_windows = int(min(times[-1], fio_t.max()) // args.window) + 1
+
+        # Backing capacity follows the RDMA bandwidth relative to its uncongested level
+        baseline = args.rdma_baseline or np.nanpercentile(rdma, 90)
+        capacity = np.clip(rdma / baseline, 0.0, 1.0) * backing_iops
+
+        lag = args.lag if args.lag is not None else estimate_detection_lag(times, rdma, modes, baseline,
+                                                                           args.default_lag)
+        # Model on the control tick, where the lag is resolved, then average into windows:
+        # netCAS acts on the capacity of the last tick at least `lag` seconds earlier
+        seen_idx = np.searchsorted(times, times - lag, side='right') - 1
+        seen = capacity[np.maximum(seen_idx, 0)]
+
+        optimal = cache_iops + capacity
+        lag_limited = split_iops(cache_iops / (cache_iops + seen), cache_iops, capacity)
+        predicted = split_iops(ratios / 100.0, cache_iops, capacity)
+
+        def per_window(values):
+            return window_mean(times, values, n_windows, args.window)
+
+        optimal, lag_limited, predicted = per_window(optimal), per_window(lag_limited), per_window(predicted)
+        measured = window_mean(fio_t, fio_iops, n_windows, args.window, fio_job)
+        win_capacity = per_window(capacity)
+
+        df = pd.DataFrame({
+            'run': self.test_id,
+            'time': np.arange(n_windows) * args.window,
+            'mode': np.round(per_window(modes.astype(float))),
+            'rdma_mbps': per_window(rdma),
+            'ratio_pct': per_window(ratios),
+            'ideal_ratio_pct': 100.0 * cache_iops / (cache_iops + win_capacity),
+            'optimal_iops': optimal,
+            'lag_limited_iops': lag_limited,
+            'predicted_iops': predicted,
+            'measured_iops': measured,
+        })
+        # optimal - measured == lag + ratio error + overhead, window by window
+        df['loss_detection_lag'] = optimal - lag_limited
+        df['loss_ratio_error'] = lag_limited - predicted
+        df['loss_splitter_overhead'] = predicted - measured
+        df.attrs['detection_lag_s'] = lag
+        return df.dropna(subset=['measured_iops', 'ratio_pct'])
+
+
+def load_rdma(path):
+    path = Path(path)
+    if path.suffix == '.rdt':
+        return RDMATrace.load(path)
+    if path.suffix == '.csv':
+        return RDMATrace.from_csv(path)
+    return RDMATrace.from_kernel_log(path)
+
+
+def find_runs(inputs):
+    """Return (run_dir, test_id) for every split ratio or netCAS metrics file found"""
+    runs = set()
+    for item in map(Path, inputs):
+        files = item.rglob('*') if item.is_dir() else [item]
+        for f in files:
+            for suffix in (NETCAS_METRICS_SUFFIX, SPLIT_RATIO_SUFFIX):
+                if f.name.endswith(suffix):
+                    runs.add((f.parent, f.name[:-len(suffix)]))
+    return sorted(runs)
+
+
+def summarize(df):
+    """Collapse one run's windows into totals and loss shares of the optimum"""
+    optimal = df['optimal_iops'].sum()
+    row = {
+        'run': df['run'].iloc[0],
+        'windows': len(df),
+        'detection_lag_s': df.attrs.get('detection_lag_s', np.nan),
+        'optimal_iops': df['optimal_iops'].mean(),
+        'measured_iops': df['measured_iops'].mean(),
+        'efficiency_pct': 100.0 * df['measured_iops'].sum() / optimal,
+    }
+    losses = ('loss_detection_lag', 'loss_ratio_error', 'loss_splitter_overhead')
+    for col in losses:
+        row[f'{col}_pct'] = 100.0 * df[col].sum() / optimal
+    row['dominant_loss'] = max(losses, key=lambda c: df[c].sum())[len('loss_'):]
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Attribute netCAS throughput loss against the optimal split')
+    parser.add_argument('inputs', nargs='+', help='Test output directories or *_split_ratio.txt / '
+                        f'*{NETCAS_METRICS_SUFFIX} files')
+    parser.add_argument('--lookup', help='find_ideal_ratio.sh CSV with cache/backing IOPS per iodepth/jobs')
+    parser.add_argument('--cache-iops', type=float, help='Cache-only IOPS, overrides --lookup')
+    parser.add_argument('--backing-iops', type=float, help='Uncongested backing-only IOPS, overrides --lookup')
+    parser.add_argument('--rdma', help='RDMA trace (.rdt/.csv) or dmesg log for runs without netCAS metrics logs')
+    parser.add_argument('--rdma-baseline', type=float, help='Uncongested RDMA MB/s (default: 90th percentile)')
+    parser.add_argument('--bs', type=float, default=64, help='fio block size in KiB (default: 64)')
+    parser.add_argument('--window', type=float, default=1.0, help='Window size in seconds (default: 1)')
+    parser.add_argument('--offset', type=float, default=0.0, help='Seconds to add to fio log times')
+    parser.add_argument('--lag', type=float, help='Detection lag in seconds (default: estimated per run)')
+    parser.add_argument('--default-lag', type=float, default=0.5,
+                        help='Detection lag when it cannot be estimated (default: 0.5)')
+    parser.add_argument('--windows-output', help='Write per-window attribution of all runs to this CSV')
+    parser.add_argument('-o', '--output', help='Write per-run summary to this CSV')
+
+    args = parser.parse_args()
+
+    args.lookup_table = None
+    if args.lookup:
+        try:
+            args.lookup_table = load_iops_lookup(args.lookup)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Error: Could not read IOPS lookup {args.lookup}: {e}")
+            return 1
+
+    runs = find_runs(args.inputs)
+    if not runs:
+        print("Error: No split ratio or netCAS metrics files found")
+        return 1
+
+    frames = []
+    for run_dir, test_id in runs:
+        try:
+            frames.append(RunAttribution(run_dir, test_id, args).analyze())
+        except (OSError, ValueError) as e:
+            print(f"Warning: Skipping {test_id}: {e}")
+
+    frames = [df for df in frames if len(df)]
+    if not frames:
+        print("Error: No runs could be analyzed")
+        return 1
+
+    summary = pd.DataFrame([summarize(df) for df in frames])
+    with pd.option_context('display.max_columns', None, 'display.width', 200, 'display.float_format', '{:.2f}'.format):
+        print("Throughput loss attribution (% of optimal IOPS):")
+        print(summary.to_string(index=False))
+
+    if args.windows_output:
+        pd.concat(frames, ignore_index=True).to_csv(args.windows_output, index=False)
+        print(f"Per-window attribution saved to {args.windows_output}")
+    if args.output:
+        summary.to_csv(args.output, index=False)
+        print(f"Summary saved to {args.output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+netCAS Metrics Exporter
+Serves an OpenMetrics endpoint combining RDMA metrics, the netCAS splitter
+state from the kernel log, casadm cache statistics and block device stats
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import threading
+import subprocess
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'graph'))
+from netcas_log import NETCAS_METRICS_PATTERN, NETCAS_MODE_CHANGE_PATTERN, RDMA_METRICS_PATTERN, MODE_NAMES
+
+DEFAULT_PORT = 9435
+RDMA_METRICS_DIR = os.environ.get('RDMA_METRICS_DIR', '/sys/kernel/rdma_metrics')
+DEFAULT_DEVICES = r'^(cas\d+-\d+|nvme\d+n\d+)$'
+OPENMETRICS_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+PROMETHEUS_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+SECTOR_SIZE = 512
+
+# /proc/diskstats fields after major, minor, name
+DISKSTATS_FIELDS = (
+    ('reads_completed', 'counter', 1, 'Reads completed'),
+    ('reads_merged', 'counter', 1, 'Reads merged'),
+    ('read_bytes', 'counter', SECTOR_SIZE, 'Bytes read'),
+    ('read_time_seconds', 'counter', 0.001, 'Time spent reading'),
+    ('writes_completed', 'counter', 1, 'Writes completed'),
+    ('writes_merged', 'counter', 1, 'Writes merged'),
+    ('written_bytes', 'counter', SECTOR_SIZE, 'Bytes written'),
+    ('write_time_seconds', 'counter', 0.001, 'Time spent writing'),
+    ('io_in_progress', 'gauge', 1, 'I/Os currently in progress'),
+    ('io_time_seconds', 'counter', 0.001, 'Time spent doing I/Os'),
+    ('io_weighted_time_seconds', 'counter', 0.001, 'Weighted time spent doing I/Os'),
+)
+
+
+class MetricFamily:
+    """One metric family and its samples, rendered in OpenMetrics or Prometheus text format"""
+
+    def __init__(self, name, kind, help_text):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.samples = []
+
+    def add(self, value, **labels):
+        self.samples.append((labels, value))
+        return self
+
+    def render(self, openmetrics):
+        # Prometheus text format names counters with their _total suffix in TYPE/HELP
+        name = self.name if openmetrics or self.kind != 'counter' else self.name + '_total'
+        suffix = '_total' if self.kind == 'counter' else ''
+        # Prometheus text format has no stateset type; its samples are plain 0/1 gauges there
+        kind = self.kind if openmetrics or self.kind != 'stateset' else 'gauge'
+        lines = [f"# HELP {name} {self.help}", f"# TYPE {name} {kind}"]
+        for labels, value in self.samples:
+            label_text = ','.join(f'{k}="{escape_label(v)}"' for k, v in labels.items())
+            label_text = '{' + label_text + '}' if label_text else ''
+            lines.append(f"{self.name}{suffix}{label_text} {format_value(value)}")
+        return '\n'.join(lines)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_value(value):
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+class RDMAMetricsCollector:
+    """Reads /sys/kernel/rdma_metrics through file descriptors kept open across scrapes"""
+
+    FILES = (('throughput', 'netcas_rdma_throughput_mbps', 'RDMA throughput reported by nvme-rdma in MB/s'),
+             ('latency', 'netcas_rdma_latency_us', 'Average RDMA completion latency in microseconds'))
+
+    def __init__(self, root):
+        self.root = root
+        self.fds = {}
+
+    def _fd(self, name):
+        if name not in self.fds:
+            self.fds[name] = os.open(os.path.join(self.root, name), os.O_RDONLY)
+        return self.fds[name]
+
+    def collect(self):
+        up = MetricFamily('netcas_rdma_metrics_up', 'gauge', 'Whether the rdma_metrics files could be read')
+        families = [up]
+        try:
+            for name, metric, help_text in self.FILES:
+                value = int(os.pread(self._fd(name), 64, 0).split()[0])
+                families.append(MetricFamily(metric, 'gauge', help_text).add(value))
+            up.add(1)
+        except (OSError, ValueError, IndexError):
+            # Module reloaded or not loaded yet: reopen on the next scrape
+            for fd in self.fds.values():
+                os.close(fd)
+            self.fds = {}
+            up.add(0)
+            families = [up]
+        return families
+
+
+class KmsgFollower(threading.Thread):
+    """Follows the kernel log in the background and keeps the latest netCAS state
+    and the latest [RDMA-METRICS] sample
+
+    Works with /dev/kmsg (one record per read) and with plain log files such
+    as the kmsg log written by rdma_trace.py replay, which has only
+    [RDMA-METRICS] lines.
+    """
+
+    def __init__(self, path):
+        super().__init__(daemon=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.state = None
+        self.updated = 0.0
+        self.mode_changes = {}
+        self.rdma = None
+        self.rdma_updated = 0.0
+        self.error = None
+
+    def run(self):
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except OSError as e:
+            self.error = e
+            return
+        # Only new records matter: skip what is already in the buffer
+        os.lseek(fd, 0, os.SEEK_END)
+        is_kmsg = not os.path.isfile(self.path)
+        pending = b''
+        while True:
+            try:
+                chunk = os.read(fd, 8192)
+            except BrokenPipeError:
+                # /dev/kmsg overwrote records we had not read yet; keep going from the next one
+                continue
+            except OSError as e:
+                self.error = e
+                return
+            if not chunk:
+                time.sleep(0.1)
+                continue
+            if is_kmsg:
+                self.handle(chunk.decode(errors='replace'))
+                continue
+            pending += chunk
+            *lines, pending = pending.split(b'\n')
+            for line in lines:
+                self.handle(line.decode(errors='replace'))
+
+    def handle(self, line):
+        match = NETCAS_METRICS_PATTERN.search(line)
+        if match:
+            with self.lock:
+                self.state = match.groupdict()
+                self.updated = time.time()
+            return
+        match = RDMA_METRICS_PATTERN.search(line)
+        if match:
+            with self.lock:
+                self.rdma = (int(match.group('tput')), int(match.group('lat')))
+                self.rdma_updated = time.time()
+            return
+        match = NETCAS_MODE_CHANGE_PATTERN.search(line)
+        if match:
+            key = (match.group('old'), match.group('new'))
+            with self.lock:
+                self.mode_changes[key] = self.mode_changes.get(key, 0) + 1
+
+    def collect(self):
+        with self.lock:
+            state, updated, changes = self.state, self.updated, dict(self.mode_changes)
+            rdma, rdma_updated = self.rdma, self.rdma_updated
+
+        families = [MetricFamily('netcas_kmsg_up', 'gauge', 'Whether the kernel log is being followed')
+                    .add(0 if self.error else 1)]
+        transitions = MetricFamily('netcas_mode_transitions', 'counter', 'netCAS mode changes seen in the kernel log')
+        for (old, new), count in sorted(changes.items()):
+            transitions.add(count, **{'from': old, 'to': new})
+        families.append(transitions)
+        if rdma is not None:
+            families += [
+                MetricFamily('netcas_kmsg_rdma_throughput_mbps', 'gauge', 'RDMA throughput of the last [RDMA-METRICS] line')
+                .add(rdma[0]),
+                MetricFamily('netcas_kmsg_rdma_latency_us', 'gauge', 'Average RDMA latency of the last [RDMA-METRICS] line')
+                .add(rdma[1]),
+                MetricFamily('netcas_kmsg_rdma_last_update_timestamp_seconds', 'gauge',
+                             'When the last [RDMA-METRICS] line was seen')
+                .add(rdma_updated),
+            ]
+        if state is None:
+            return families
+
+        mode = int(state['mode'])
+        mode_info = MetricFamily('netcas_mode', 'stateset', 'Current netCAS splitter mode')
+        for number, name in MODE_NAMES.items():
+            mode_info.add(1 if number == mode else 0, netcas_mode=name)
+        families += [
+            mode_info,
+            MetricFamily('netcas_split_ratio_percent', 'gauge', 'Share of requests sent to the cache')
+            .add(float(state['ratio'])),
+            MetricFamily('netcas_monitor_rdma_mbps', 'gauge', 'RDMA bandwidth seen by the netCAS monitor')
+            .add(int(state['rdma'])),
+            MetricFamily('netcas_monitor_rdma_latency_us', 'gauge', 'RDMA latency seen by the netCAS monitor')
+            .add(int(state['lat'])),
+            MetricFamily('netcas_monitor_rdma_latency_baseline_us', 'gauge', 'RDMA latency baseline')
+            .add(int(state['lat_base'])),
+            MetricFamily('netcas_monitor_iops', 'gauge', 'IOPS reported by the netCAS monitor')
+            .add(int(state['iops'])),
+            MetricFamily('netcas_bandwidth_drop_percent', 'gauge', 'RDMA bandwidth drop against the baseline')
+            .add(int(state['bw_drop'])),
+            MetricFamily('netcas_latency_increase_percent', 'gauge', 'RDMA latency increase against the baseline')
+            .add(int(state['lat_inc'])),
+            MetricFamily('netcas_monitor_last_update_timestamp_seconds', 'gauge', 'When the last metrics line was seen')
+            .add(updated),
+        ]
+        return families
+
+
+class CasStatsCollector(threading.Thread):
+    """Runs `casadm -P` in the background every TTL seconds; scrapes only read the cached result"""
+
+    def __init__(self, cache_ids, ttl, timeout):
+        super().__init__(daemon=True)
+        self.cache_ids = cache_ids
+        self.ttl = ttl
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.fetched = {}
+        self.duration = 0.0
+
+    def run(self):
+        while True:
+            start = time.monotonic()
+            for cache_id in self.cache_ids:
+                stats = self.fetch(cache_id)
+                with self.lock:
+                    if stats is not None:
+                        self.stats[cache_id] = stats
+                        self.fetched[cache_id] = time.time()
+            self.duration = time.monotonic() - start
+            time.sleep(max(self.ttl - self.duration, 0.1))
+
+    def fetch(self, cache_id):
+        try:
+            result = subprocess.run(['casadm', '-P', '-i', str(cache_id), '-o', 'csv'], capture_output=True,
+                                    text=True, timeout=self.timeout)
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        if result.returncode != 0:
+            return None
+        return parse_casadm_csv(result.stdout)
+
+    def collect(self):
+        with self.lock:
+            stats, fetched = dict(self.stats), dict(self.fetched)
+
+        family = MetricFamily('netcas_cas_stat', 'gauge', 'casadm -P statistic (name and unit as printed by casadm)')
+        age = MetricFamily('netcas_cas_stats_age_seconds', 'gauge', 'Age of the cached casadm statistics')
+        now = time.time()
+        for cache_id in self.cache_ids:
+            if cache_id not in stats:
+                continue
+            age.add(now - fetched[cache_id], cache=cache_id)
+            for (name, unit), value in stats[cache_id].items():
+                family.add(value, cache=cache_id, stat=name, unit=unit)
+        duration = MetricFamily('netcas_casadm_duration_seconds', 'gauge', 'Time the last casadm refresh took')
+        return [family, age, duration.add(self.duration)]
+
+
+def parse_casadm_csv(text):
+    """Parse `casadm -P -o csv` output into {(stat name, unit): value} for numeric columns"""
+    lines = [line for line in text.splitlines() if line.strip()]
+    if len(lines) < 2:
+        return {}
+    header, values = lines[0].split(','), lines[1].split(',')
+    stats = {}
+    for column, value in zip(header, values):
+        match = re.match(r'\s*(.*?)\s*(?:\[(.*)\])?\s*$', column)
+        try:
+            stats[(match.group(1), match.group(2) or '')] = float(value)
+        except ValueError:
+            continue
+    return stats
+
+
+class DiskstatsCollector:
+    """Parses /proc/diskstats for the CAS and NVMe devices from a descriptor kept open across scrapes"""
+
+    def __init__(self, device_pattern, path='/proc/diskstats'):
+        self.pattern = re.compile(device_pattern)
+        self.fd = os.open(path, os.O_RDONLY)
+
+    def collect(self):
+        # /proc files are generated on read; 64 KiB covers several hundred devices
+        data = os.pread(self.fd, 65536, 0).decode()
+        families = [MetricFamily(f'netcas_disk_{name}', kind, help_text) for name, kind, _, help_text in DISKSTATS_FIELDS]
+        for line in data.splitlines():
+            fields = line.split()
+            if len(fields) < 14 or not self.pattern.match(fields[2]):
+                continue
+            for family, (_, _, scale, _), raw in zip(families, DISKSTATS_FIELDS, fields[3:14]):
+                value = int(raw)
+                family.add(value * scale if scale != 1 else value, device=fields[2])
+        return families
+
+
+class Exporter:
+    """Combines the collectors and reuses the rendered page for scrapes that arrive too close together"""
+
+    def __init__(self, collectors, min_interval):
+        self.collectors = collectors
+        self.min_interval = min_interval
+        self.lock = threading.Lock()
+        self.cache = {}
+
+    def render(self, openmetrics):
+        with self.lock:
+            cached = self.cache.get(openmetrics)
+            if cached and time.monotonic() - cached[0] < self.min_interval:
+                return cached[1]
+
+            start = time.perf_counter()
+            families = []
+            for collector in self.collectors:
+                families += collector.collect()
+            scrape = MetricFamily('netcas_exporter_scrape_duration_seconds', 'gauge', 'Time spent collecting')
+            families.append(scrape.add(time.perf_counter() - start))
+
+            body = '\n'.join(f.render(openmetrics) for f in families if f.samples or f.kind == 'counter') + '\n'
+            if openmetrics:
+                body += '# EOF\n'
+            body = body.encode()
+            self.cache[openmetrics] = (time.monotonic(), body)
+            return body
+
+
+def make_handler(exporter):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            openmetrics = 'application/openmetrics-text' in self.headers.get('Accept', '')
+            body = exporter.render(openmetrics)
+            self.send_response(200)
+            self.send_header('Content-Type', OPENMETRICS_TYPE if openmetrics else PROMETHEUS_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export netCAS, RDMA and CAS statistics for Prometheus')
+    parser.add_argument('--address', default='', help='Address to listen on (default: all)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Port to listen on (default: {DEFAULT_PORT})')
+    parser.add_argument('--rdma-dir', default=RDMA_METRICS_DIR,
+                        help=f'rdma_metrics directory (default: $RDMA_METRICS_DIR or {RDMA_METRICS_DIR})')
+    parser.add_argument('--kmsg', default='/dev/kmsg', help='Kernel log to follow (default: /dev/kmsg)')
+    parser.add_argument('--cache-id', type=int, action='append', help='OpenCAS cache id to query (default: 1)')
+    parser.add_argument('--casadm-ttl', type=float, default=5.0, help='Seconds between casadm -P runs (default: 5)')
+    parser.add_argument('--casadm-timeout', type=float, default=3.0, help='casadm -P timeout in seconds (default: 3)')
+    parser.add_argument('--no-casadm', action='store_true', help='Do not collect casadm statistics')
+    parser.add_argument('--devices', default=DEFAULT_DEVICES, help='Regex of block devices to export')
+    parser.add_argument('--min-interval', type=float, default=0.5,
+                        help='Serve the previous result to scrapes closer than this many seconds (default: 0.5)')
+
+    args = parser.parse_args()
+
+    kmsg = KmsgFollower(args.kmsg)
+    kmsg.start()
+    collectors = [RDMAMetricsCollector(args.rdma_dir), kmsg]
+    if not args.no_casadm:
+        cas = CasStatsCollector(args.cache_id or [1], args.casadm_ttl, args.casadm_timeout)
+        cas.start()
+        collectors.append(cas)
+    try:
+        collectors.append(DiskstatsCollector(args.devices))
+    except OSError as e:
+        print(f"Warning: /proc/diskstats unavailable: {e}")
+
+    server = ThreadingHTTPServer((args.address, args.port), make_handler(Exporter(collectors, args.min_interval)))
+    print(f"Serving netCAS metrics on http://{args.address or '0.0.0.0'}:{args.port}/metrics")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+#!/usr/bin/python
+"""Statistics over repeated runs.
+
+Results are a 2-D array with one row per run and one column per metric
+(or per configuration, e.g. split ratio), and every function works on all
+columns at once. Missing results are NaN and are left out of their column.
+
+summarize() gives mean, median, standard deviation, min, max and the
+t-based confidence interval of the mean for any number of runs,
+bootstrap_percentile() a bootstrap confidence interval of a percentile and
+outliers() flags runs that do not look like the others. errorbar_table()
+turns a sweep into a stupidplot table with error bars.
+"""
+from __future__ import print_function
+
+import math
+
+import numpy as np
+
+CONFIDENCE = 0.95
+BOOTSTRAP_RESAMPLES = 2000
+
+
+def normal_quantile(p):
+    """Returns the p quantile of the standard normal distribution
+    (Acklam's rational approximation, relative error below 1.2e-9)"""
+    a = (-3.969683028665376e+01, 2.209460984245205e+02,
+         -2.759285104469687e+02, 1.383577518672690e+02,
+         -3.066479806614716e+01, 2.506628277459239e+00)
+    b = (-5.447609879822406e+01, 1.615858368580409e+02,
+         -1.556989798598866e+02, 6.680131188771972e+01,
+         -1.328068155288572e+01)
+    c = (-7.784894002430293e-03, -3.223964580411365e-01,
+         -2.400758277161838e+00, -2.549732539343734e+00,
+         4.374664141464968e+00, 2.938163982698783e+00)
+    d = (7.784695709041462e-03, 3.224671290700398e-01,
+         2.445134137142996e+00, 3.754408661907416e+00)
+    p = np.asarray(p, dtype=np.float64)
+    low = np.minimum(p, 1 - p)
+
+    # Tails
+    q = np.sqrt(-2 * np.log(np.maximum(low, 1e-300)))
+    tail = (((((c[0] * q + c[1]) * q + c[2]) * q + c[3]) * q + c[4]) * q +
+            c[5]) / ((((d[0] * q + d[1]) * q + d[2]) * q + d[3]) * q + 1)
+    tail = np.where(p < 0.5, tail, -tail)
+
+    # Central region
+    q = p - 0.5
+    r = q * q
+    central = (((((a[0] * r + a[1]) * r + a[2]) * r + a[3]) * r + a[4]) * r +
+               a[5]) * q / (((((b[0] * r + b[1]) * r + b[2]) * r + b[3]) * r +
+                             b[4]) * r + 1)
+    return np.where(low < 0.02425, tail, central)
+
+
+def t_quantile(confidence, df):
+    """Returns the two-sided critical value of Student's t distribution,
+    e.g. TINV(1 - confidence, df), for an array of degrees of freedom
+
+    Hill's algorithm 396 (Comm. ACM 13, 1970): exact for df 1 and 2,
+    within 0.02 % of the tabulated values for df 3 and 4 and within
+    0.001 % from df 5 on.
+    """
+    p = 1.0 - confidence
+    n = np.asarray(df, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        a = 1 / (n - 0.5)
+        b = 48 / (a * a)
+        c = ((20700 * a / b - 98) * a - 16) * a + 96.36
+        d = ((94.5 / (b + c) - 3) / b + 1) * np.sqrt(a * math.pi / 2) * n
+        x = d * p
+        y = x ** (2 / n)
+
+        # Large y: start from the normal quantile
+        z = -normal_quantile(p / 2)
+        zz = z * z
+        cz = np.where(n < 5, c + 0.3 * (n - 4.5) * (z + 0.6), c)
+        cz = (((0.05 * d * z - 5) * z - 7) * z - 2) * z + b + cz
+        large = (((((0.4 * zz + 6.3) * zz + 36) * zz + 94.5) / cz - zz - 3) /
+                 b + 1) * z
+        large = np.expm1(a * large * large)
+
+        small = ((1 / (((n + 6) / (n * y) - 0.089 * d - 0.822) * (n + 2) * 3) +
+                  0.5 / (n + 4)) * y - 1) * (n + 1) / (n + 2) + 1 / y
+
+        result = np.sqrt(n * np.where(y > 0.05 + a, large, small))
+    result = np.where(n == 2, math.sqrt(2 / (p * (2 - p)) - 2), result)
+    result = np.where(n == 1, 1 / math.tan(p * math.pi / 2), result)
+    return np.where(n >= 1, result, np.nan)
+
+
+class Summary(object):
+    """Per column statistics of a runs x metrics array"""
+    __slots__ = ("count", "mean", "median", "std", "min", "max", "ci")
+
+    def __init__(self, data, confidence=CONFIDENCE):
+        data = np.asarray(data, dtype=np.float64)
+        if data.ndim == 1:
+            data = data[:, np.newaxis]
+        valid = ~np.isnan(data)
+        self.count = valid.sum(axis=0)
+        total = np.where(valid, data, 0).sum(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.mean = total / self.count
+            deviations = np.where(valid, data - self.mean, 0)
+            # Sample standard deviation, a single run has none
+            self.std = np.sqrt((deviations ** 2).sum(axis=0) /
+                               np.maximum(self.count - 1, 1))
+            self.std[self.count < 2] = 0.0
+            self.ci = t_quantile(confidence, self.count - 1) * \
+                self.std / np.sqrt(self.count)
+        self.ci[self.count < 2] = np.nan
+
+        # One sort gives median, min and max; NaNs sort to the end
+        ordered = np.sort(data, axis=0)
+        columns = np.arange(data.shape[1])
+        last = np.maximum(self.count - 1, 0)
+        self.min = np.where(self.count > 0, ordered[0], np.nan)
+        self.max = np.where(self.count > 0, ordered[last, columns], np.nan)
+        self.median = np.where(self.count > 0,
+                               (ordered[last // 2, columns] +
+                                ordered[(self.count // 2).clip(max=last),
+                                        columns]) / 2,
+                               np.nan)
+
+    def bounds(self):
+        """Returns the lower and upper end of the confidence intervals"""
+        return self.mean - self.ci, self.mean + self.ci
+
+
+def summarize(data, confidence=CONFIDENCE):
+    """Returns the Summary of every column of data (runs x metrics)"""
+    return Summary(data, confidence)
+
+
+def bootstrap_percentile(data, percentile, confidence=CONFIDENCE,
+                         resamples=BOOTSTRAP_RESAMPLES, seed=None):
+    """Returns the percentile of every column of data and the lower and
+    upper end of its percentile-bootstrap confidence interval
+
+    All resamples of all columns are drawn as one (resamples x runs) index
+    array; NaN runs are left out of the resampled percentiles.
+    """
+    data = np.asarray(data, dtype=np.float64)
+    if data.ndim == 1:
+        data = data[:, np.newaxis]
+    random = np.random.RandomState(seed)
+    index = random.randint(0, len(data), size=(resamples, len(data)))
+    with np.errstate(invalid="ignore"):
+        estimate = np.nanpercentile(data, percentile, axis=0)
+        resampled = np.nanpercentile(data[index], percentile, axis=1)
+        tail = (1 - confidence) / 2 * 100
+        low, high = np.nanpercentile(resampled, [tail, 100 - tail], axis=0)
+    return estimate, low, high
+
+
+def outliers(data, method="mad", threshold=None):
+    """Returns a mask of the runs that are outliers in their column
+
+    "mad": modified z-score |0.6745 (x - median) / MAD| above threshold
+    (default 3.5, Iglewicz and Hoaglin). "iqr": outside the Tukey fences,
+    threshold (default 1.5) interquartile ranges beyond the quartiles.
+    """
+    data = np.asarray(data, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if method == "mad":
+            if threshold is None:
+                threshold = 3.5
+            median = np.nanmedian(data, axis=0)
+            mad = np.nanmedian(np.abs(data - median), axis=0)
+            score = 0.6745 * np.abs(data - median) / mad
+            # All runs but the outlier agree: any deviation is one
+            score = np.where(mad == 0, np.where(data == median, 0, np.inf),
+                             score)
+            return score > threshold
+        if method == "iqr":
+            if threshold is None:
+                threshold = 1.5
+            low, high = np.nanpercentile(data, [25, 75], axis=0)
+            spread = threshold * (high - low)
+            return (data < low - spread) | (data > high + spread)
+    raise ValueError("unknown outlier method %r" % method)
+
+
+def errorbar_table(xs, data, heading, xlabel="x", confidence=CONFIDENCE,
+                   drop_outliers=False):
+    """Returns a stupidplot table (use with "errorbars": [1]) of the mean
+    and confidence interval of every column of data (runs x len(xs))"""
+    data = np.asarray(data, dtype=np.float64)
+    if drop_outliers:
+        data = np.where(outliers(data), np.nan, data)
+    summary = summarize(data, confidence)
+    low, high = summary.bounds()
+    table = [[xlabel, heading, "low", "high"]]
+    for row in zip(xs, summary.mean, low, high):
+        table.append([float(value) for value in row])
+    return table
@@ -11,10 +11,11 @@ the gnuplotOptions dictionary. You will likely need to know a bit about
 GnuPlot and read the source to this module to understand what is going on.
 """
 
-import math
 import os
 import tempfile
 
+import runstats
+
 
 # A few "standard" label types
 # 12.345
@@ -85,140 +86,22 @@ def histogram( data, numBuckets, minTruncate=None, maxTruncate=None ):
 	
 	return out
 
-# T statistic for 0.05 confidence (95%)
-# Computed with Excel: =TINV(0.05, x)
-# TODO: Import python code for computing this
-T_TABLE = [
-    None,
-    12.706204733987,
-    4.30265272954454,
-    3.18244630488688,
-    2.77644510504380,
-    2.57058183469754,
-    2.44691184643268,
-    2.36462425094932,
-    2.30600413329912,
-    2.26215715817358,
-    2.22813884242587,
-    2.20098515872184,
-    2.17881282716507,
-    2.16036865224854,
-    2.14478668128208,
-    2.13144953567595,
-    2.11990528516258,
-    2.10981555859266,
-    2.10092203686118,
-    2.09302404985486,
-    2.08596344129554,
-    2.07961383708272,
-    2.07387305831561,
-    2.06865759861054,
-    2.06389854731807,
-    2.05953853565859,
-    2.05552941848069,
-    2.05183049297067,
-    2.04840711466289,
-    2.04522961110855,
-    2.04227244936679,
-    2.03951343844151,
-    2.03693333440703,
-    2.03451528722141,
-    2.03224449783959,
-    2.03010791544831,
-    2.02809398678268,
-    2.02619244736580,
-    2.02439414671557,
-    2.02269090124204,
-    2.02107536985045,
-    2.01954094826419,
-    2.01808167886218,
-    2.01669217343735,
-    2.01536754676655,
-    2.01410335926697,
-    2.01289556732150,
-    2.01174048010300,
-    2.01063472192628,
-    2.00957519932024,
-    2.00855907214326,
-    2.00758372817470,
-    2.00664676070409,
-    2.00574594871316,
-    2.00487927499539,
-    2.00404476937785,
-    2.00324070420509,
-    2.00246544390452,
-    2.00171746800345,
-    2.00099536118020,
-    2.00029780432954,
-    1.99962356652375,
-    1.99897149776650,
-    1.99834052244951,
-    1.99772963343394,
-    1.99713788668814,
-    1.99656439642122,
-    1.99600833066037,
-    1.99546890722492,
-    1.99494539005665,
-    1.99443708586968,
-    1.99394334108840,
-    1.99346353904453,
-    1.99299709740838,
-    1.99254346583172,
-    1.99210212378202,
-    1.99167257855056,
-    1.99125436341783,
-    1.99084703596246,
-    1.99045017650031,
-    1.99006338664240,
-    1.98968628796136,
-    1.98931852075642,
-    1.98895974290966,
-    1.98860962882431,
-    1.98826786843964,
-    1.98793416631522,
-    1.98760824077917,
-    1.98728982313560,
-    1.98697865692559,
-    1.98667449723875,
-    1.98637711007022,
-    1.98608627172049,
-    1.98580176823426,
-    1.98552339487556,
-    1.98525095563659,
-    1.98498426277744,
-    1.98472313639477,
-    1.98446740401708,
-    1.98421690022499,
-    1.98397146629437]
-
-
 def stats(r):
     """Returns statistics about a sequence of numbers.
     
-    Returns (average, median, standard deviation, min, max, 95% confidence interval)"""
+    Returns (average, median, standard deviation, min, max, 95% confidence interval)
 
-    total = sum(r)
-    average = total/float(len(r))
-    sum_deviation_squared = sum([(i-average)**2 for i in r])
-    standard_deviation = math.sqrt(sum_deviation_squared/(len(r)-1 or 1))
-    s = list(r)
-    s.sort()
-    median = s[len(s)/2]
-    minimum = s[0]
-    maximum = s[-1]
-    # z value for 95% confidence interval is ~1.96
-    # This isn't correct for sampled data, since we don't *know* the standard deviation
-    # See: http://davidmlane.com/hyperstat/
-    # confidence_95 = 1.959963984540051 * standard_deviation / math.sqrt(len(r))
-    # We must estimate both using the t distribution:
-    # http://davidmlane.com/hyperstat/B7483.html
-    # s_m = s / sqrt(N)
-    s_m = standard_deviation / math.sqrt(len(r))
-    # Degrees of freedom = n-1
-    # t = t(degrees_of_freedom, 0.05)
-    # confidence = +/- t * s_m
-    confidence_95 = T_TABLE[len(r)-1] * s_m
-    return average, median, standard_deviation, minimum, maximum, confidence_95
+    See runstats for many sequences (runs x metrics) at once."""
+    s = sorted(r)
+    summary = runstats.summarize(s)
+    # The median is the upper middle element and a single run has no interval
+    median = s[len(s) // 2]
+    if len(s) < 2:
+        confidence_95 = 0.0
+    else:
+        confidence_95 = float(summary.ci[0])
+    return (float(summary.mean[0]), median, float(summary.std[0]),
+            float(summary.min[0]), float(summary.max[0]), confidence_95)
 
 
 def hackDottedStyle( epsFile ):
@@ -1,27 +1,276 @@
 #!/usr/bin/python
 
-"""Averages the per transaction latency for TPC-C traces."""
+"""Summarizes the per transaction latency of TPC-C traces.
 
+Traces are read in chunks and folded into one summary per transaction
+type: count, mean and standard deviation (running moments), min, max and
+a log-bucketed histogram the percentiles are read from (within 0.5 %).
+Memory stays constant however long the run was, and summaries merge, so
+the JSON written for one host can be passed in again together with the
+traces or summaries of other hosts.
+
+Accepted inputs: TPC-C traces (tab separated, after the "Transaction
+Number" header line, until the first empty line), OLTPBench .raw files and
+JSON summaries written by this script. Without inputs a trace is read from
+stdin.
+"""
+
+from __future__ import print_function
+
+import argparse
+import itertools
+import json
+import math
 import sys
 
-if __name__ == "__main__":
-    start = False
-
-    count = 0
-    sum = 0
-    for line in sys.stdin:
-        if not start:
-            start = line.startswith("Transaction Number")
-        elif start:
-            if line == "\n": break
-            parts = line.split("\t")
+import numpy as np
+
+CHUNK_LINES = 1 << 18
+# Buckets grow by 1 %, a bucket's geometric middle is within 0.5 % of any value in it
+RELATIVE_ERROR = 0.01
+BUCKETS = int(math.ceil(math.log(2 ** 40) / math.log(1 + RELATIVE_ERROR))) + 2
+PERCENTILES = (50, 90, 95, 99, 99.9)
+
+
+def bucket_index(latencies):
+    """Returns the histogram bucket of every latency, 0 holds latencies below 1"""
+    latencies = np.maximum(np.asarray(latencies, dtype=np.float64), 0)
+    index = np.zeros(len(latencies), dtype=np.int64)
+    positive = latencies >= 1
+    index[positive] = np.floor(np.log(latencies[positive]) /
+                               math.log(1 + RELATIVE_ERROR)).astype(np.int64) + 1
+    return np.minimum(index, BUCKETS - 1)
+
+
+def bucket_value(index):
+    """Returns the representative latency of a bucket"""
+    if index == 0:
+        return 0.0
+    return (1 + RELATIVE_ERROR) ** (index - 0.5)
+
+
+class LatencySummary(object):
+    """Mergeable summary of the latencies of one transaction type"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.histogram = np.zeros(BUCKETS, dtype=np.int64)
+
+    def _merge_moments(self, count, mean, m2, low, high):
+        # Chan et al. pairwise update of the running mean and squared deviations
+        if not count:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / float(total)
+        self.m2 += m2 + delta * delta * self.count * count / float(total)
+        self.count = total
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+    def add(self, latencies):
+        """Adds an array of latencies"""
+        latencies = np.asarray(latencies, dtype=np.float64)
+        if not len(latencies):
+            return
+        mean = latencies.mean()
+        self._merge_moments(len(latencies), mean,
+                            float(((latencies - mean) ** 2).sum()),
+                            float(latencies.min()), float(latencies.max()))
+        self.histogram += np.bincount(bucket_index(latencies),
+                                      minlength=BUCKETS)
+
+    def merge(self, other):
+        """Adds the latencies summarized by other"""
+        self._merge_moments(other.count, other.mean, other.m2,
+                            other.min, other.max)
+        self.histogram += other.histogram
+
+    def stddev(self):
+        if self.count < 2:
+            return 0.0
+        return math.sqrt(self.m2 / self.count)
+
+    def percentile(self, percentile):
+        """Returns the latency below which percentile % of the samples fall"""
+        if not self.count:
+            return 0.0
+        rank = int(math.ceil(percentile / 100.0 * self.count))
+        index = int(np.searchsorted(np.cumsum(self.histogram), max(rank, 1)))
+        # The estimate never leaves the observed range
+        return min(max(bucket_value(index), self.min), self.max)
+
+    def to_dict(self):
+        result = {
+            "count": self.count,
+            "mean": self.mean,
+            "stddev": self.stddev(),
+            "min": self.min,
+            "max": self.max,
+            "m2": self.m2,
+            "percentiles": dict(("p%s" % p, self.percentile(p))
+                                for p in PERCENTILES),
+            "histogram": dict((str(i), int(n)) for i, n
+                              in enumerate(self.histogram) if n),
+        }
+        return result
+
+    @classmethod
+    def from_dict(cls, data):
+        summary = cls()
+        summary.count = data["count"]
+        summary.mean = data["mean"]
+        summary.m2 = data["m2"]
+        summary.min = data["min"]
+        summary.max = data["max"]
+        for index, count in data["histogram"].items():
+            summary.histogram[int(index)] = count
+        return summary
+
+
+class TraceSummary(object):
+    """Latency summaries per transaction type, and over all of them"""
+
+    def __init__(self):
+        self.types = {}
+
+    def add(self, types, latencies):
+        """Adds the latencies of a chunk, types[i] is the type of latencies[i]"""
+        types = np.asarray(types)
+        latencies = np.asarray(latencies, dtype=np.float64)
+        keys, inverse = np.unique(types, return_inverse=True)
+        inverse = inverse.ravel()
+        order = np.argsort(inverse, kind="mergesort")
+        bounds = np.cumsum(np.bincount(inverse, minlength=len(keys)))[:-1]
+        for key, group in zip(keys, np.split(latencies[order], bounds)):
+            self.types.setdefault(str(key), LatencySummary()).add(group)
+
+    def merge(self, other):
+        for key, summary in other.types.items():
+            self.types.setdefault(key, LatencySummary()).merge(summary)
+
+    def overall(self):
+        total = LatencySummary()
+        for summary in self.types.values():
+            total.merge(summary)
+        return total
+
+    def to_dict(self):
+        return {
+            "relative_error": RELATIVE_ERROR,
+            "types": dict((key, summary.to_dict())
+                          for key, summary in self.types.items()),
+            "all": self.overall().to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("relative_error") != RELATIVE_ERROR:
+            raise ValueError("summary was written with a different histogram resolution")
+        summary = cls()
+        for key, value in data["types"].items():
+            summary.types[key] = LatencySummary.from_dict(value)
+        return summary
+
+
+def read_trace(lines, summary):
+    """Adds a TPC-C trace or an OLTPBench .raw file to summary"""
+    lines = iter(lines)
+    for line in lines:
+        if line.startswith("Transaction Number"):
+            # Column positions from the header, the old fixed ones otherwise
+            header = line.rstrip("\n").split("\t")
+            separator, type_column, latency_column = "\t", 1, 3
+            for i, name in enumerate(header):
+                if "Type" in name:
+                    type_column = i
+                elif "Latency" in name:
+                    latency_column = i
+            break
+        if line.startswith("Transaction Type Index"):
+            separator, type_column, latency_column = ",", 1, 3
+            break
+    else:
+        return
+
+    while True:
+        chunk = list(itertools.islice(lines, CHUNK_LINES))
+        end = len(chunk)
+        if separator == "\t" and "\n" in chunk:
+            # The transaction list of a TPC-C trace ends at the first empty line
+            end = chunk.index("\n")
+        types = []
+        latencies = []
+        for line in chunk[:end]:
+            parts = line.rstrip("\n").split(separator)
+            if len(parts) <= max(type_column, latency_column):
+                continue
+            types.append(parts[type_column].strip())
+            latencies.append(parts[latency_column])
+        if types:
             try:
-                latency = int(parts[3])
-            except:
-                print repr(line)
+                summary.add(types, np.array(latencies, dtype=np.float64))
+            except ValueError:
+                print("Bad latency in trace chunk starting with %r" % chunk[0],
+                      file=sys.stderr)
                 raise
+        if end < len(chunk) or not chunk:
+            break
+
+
+def write_csv(summary, output):
+    columns = ["count", "mean", "stddev", "min", "max"]
+    output.write(",".join(["type"] + columns +
+                          ["p%s" % p for p in PERCENTILES]) + "\n")
+    rows = sorted(summary.types.items()) + [("all", summary.overall())]
+    for key, latency in rows:
+        data = latency.to_dict()
+        output.write(",".join([key] + [str(data[c]) for c in columns] +
+                              [str(data["percentiles"]["p%s" % p])
+                               for p in PERCENTILES]) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Per transaction latency summary of TPC-C traces")
+    parser.add_argument("inputs", nargs="*",
+                        help="traces, .raw files or JSON summaries to merge (default: stdin)")
+    parser.add_argument("--format", choices=("json", "csv"), default="json")
+    parser.add_argument("-o", "--output", help="write the summary here instead of stdout")
+    args = parser.parse_args()
 
-            sum += latency
-            count += 1
+    summary = TraceSummary()
+    for path in args.inputs or ["-"]:
+        if path == "-":
+            read_trace(sys.stdin, summary)
+            continue
+        with open(path) as data:
+            if path.endswith(".json"):
+                summary.merge(TraceSummary.from_dict(json.load(data)))
+            else:
+                read_trace(data, summary)
 
-    print "%d / %d = %f average" % (sum, count, float(sum) / count)
+    output = sys.stdout
+    if args.output:
+        output = open(args.output, "w")
+    if args.format == "csv":
+        write_csv(summary, output)
+    else:
+        json.dump(summary.to_dict(), output, indent=1, sort_keys=True)
+        output.write("\n")
+    if args.output:
+        output.close()
+
+    overall = summary.overall()
+    if overall.count:
+        print("%d / %d = %f average" % (overall.mean * overall.count,
+                                        overall.count, overall.mean),
+              file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
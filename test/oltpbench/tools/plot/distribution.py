@@ -1,29 +1,60 @@
 #!/usr/bin/python
-
-import csv
+"""Per-window throughput and latency distribution of a raw latency log.
+
+Samples are binned by start time, so rows written out of order by many
+terminals still land in the right window. The input is read in chunks and
+a window is only summarised once no sample can arrive for it any more
+(the newest start time seen is more than --lateness seconds past its end),
+so files larger than memory can be processed.
+"""
+from __future__ import print_function
+
+import argparse
+import itertools
 import os.path
 import sys
 
-def CSVIterator(path):
-    """Returns an iterator over rows in path. If path is '-' it reads from stdin."""
+import numpy as np
+
+CHUNK_ROWS = 1 << 20
+
+
+def CSVChunks(path, chunk_rows=CHUNK_ROWS):
+    """Returns an iterator over (start seconds, latency us) arrays of the
+    rows in path. If path is '-' it reads from stdin."""
     if path == "-":
         data = sys.stdin
     else:
         data = open(path)
 
-    reader = csv.reader(data)
-    # skip the first line
-    reader.next()
-    for row in reader:
-        # Skip any trailing blank lines
-        if len(row) == 0: continue
-        out = []
-        try:
-            out.append(float(row[1]))
-            out.append(float(row[2]))
-        except ValueError:
-            pass
-        yield out
+    # skip the first line, and read the columns the header names
+    header = data.readline()
+    columns = [1, 2]
+    if "Transaction Name" in header:
+        columns = [2, 3]
+
+    try:
+        import pandas as pd
+    except ImportError:
+        pd = None
+
+    if pd is not None:
+        for chunk in pd.read_csv(data, header=None, usecols=columns,
+                                 engine="c", chunksize=chunk_rows,
+                                 skip_blank_lines=True):
+            chunk = chunk.apply(pd.to_numeric, errors="coerce").dropna()
+            yield (chunk[columns[0]].values.astype(np.float64),
+                   chunk[columns[1]].values.astype(np.float64))
+    else:
+        while True:
+            # Skip any trailing blank lines
+            lines = [line for line in itertools.islice(data, chunk_rows)
+                     if line.strip()]
+            if not lines:
+                break
+            rows = np.loadtxt(lines, delimiter=",", usecols=columns,
+                              ndmin=2, dtype=np.float64)
+            yield rows[:, 0], rows[:, 1]
 
     data.close()
 
@@ -41,89 +72,124 @@ class DistributionStatistics(object):
             self.percentiles = [0] * len(DistributionStatistics.PERCENTILES)
             return
 
-        samples.sort()
-
-        self.average = sum(samples) / float(len(samples))
+        samples = np.asarray(samples, dtype=np.float64)
+        self.average = samples.mean()
         self.throughput = len(samples) / float(time_secs)
-	#print self.average, len(samples), time_secs, sum(samples)
-        # NOTE: NIST recommends interpolating. This just selects the closest value, which is
-        # described as another common technique.
+        # Linear interpolation between the closest ranks, as NIST recommends
         # http://www.itl.nist.gov/div898/handbook/prc/section2/prc252.htm
-        self.percentiles = []
-        for percentile_rank in DistributionStatistics.PERCENTILES:
-            index = int(percentile_rank * len(samples))
-            if index == len(samples):
-                index -= 1
-            self.percentiles.append(samples[index])
-
-def timeBucket(samples, start_time_us, window_secs):
-    #print "Everything starts from", start_time_us
-    windows = []
-    window_start = start_time_us
-    window_end = window_start + window_secs
-    window_samples = []
-    #print window_start, window_end
-    def addSamples():
-        start_seconds = (window_start - start_time_us)
-        #print "ADD:", start_seconds, len(window_samples)
-        if len(window_samples) == 0:
-            print "WARNING: empty window at start time =", start_seconds
-        windows.append((start_seconds, DistributionStatistics(window_samples, window_secs)))
-
-        #~ print start_seconds, len(window_samples), windows[-1][1].average, windows[-1][1].throughput
-
-    for (start_us, latency_us) in samples:
-        while window_end <= start_us:
-            # Window has ended
-            addSamples()
-            window_start = window_end
-            window_end = window_start + window_secs
-            window_samples = []
-            #print "NEXT:", window_start, window_end
-        window_samples.append(latency_us)
-
-    if len(window_samples) > 0:
-        # We used to add this sample, but it frequnetly led to skewed results due to an incomplete
-        # bucket
-        print "WARNING: discarding incomplete time bucket with %d samples; time range [%d, %d)" % (
-                len(window_samples), (window_start - start_time_us), (window_end  - start_time_us))
-        #~ addSamples()
-
-    return windows
+        self.percentiles = list(np.percentile(
+            samples, [rank * 100 for rank in DistributionStatistics.PERCENTILES]))
+
+
+def timeBucket(chunks, window_secs, lateness_secs=None):
+    """Returns an iterator over (window start seconds, DistributionStatistics)
+    of the windows of window_secs seconds since the earliest sample of the
+    first chunk.
+
+    A window is emitted once the newest start time seen is lateness_secs
+    (default: one window) past its end; samples that arrive later than that
+    are counted and reported, as are samples that start before the first
+    window but only arrive in a later chunk. The last window usually ends
+    after the last sample: its throughput is computed over the time it
+    covers.
+    """
+    if lateness_secs is None:
+        lateness_secs = window_secs
+    pending = {}
+    start_time = None
+    newest = None
+    next_window = None
+    late = 0
+
+    def summarise(window, time_secs):
+        samples = pending.pop(window, [])
+        if samples:
+            samples = np.concatenate(samples)
+        else:
+            print("WARNING: empty window at start time =", window * window_secs)
+        return window * window_secs, DistributionStatistics(samples, time_secs)
+
+    for starts, latencies in chunks:
+        if not len(starts):
+            continue
+        if start_time is None:
+            # Rows are not in start order, the first one need not be the earliest
+            start_time = starts.min()
+        windows = np.floor((starts - start_time) / window_secs).astype(np.int64)
+        if next_window is None:
+            next_window = windows.min()
+        chunk_newest = starts.max()
+        if newest is None or chunk_newest > newest:
+            newest = chunk_newest
+
+        # Windows that were already emitted cannot take these samples any more
+        too_late = windows < next_window
+        if too_late.any():
+            late += int(too_late.sum())
+            windows = windows[~too_late]
+            latencies = latencies[~too_late]
+
+        order = np.argsort(windows, kind="mergesort")
+        windows = windows[order]
+        latencies = latencies[order]
+        keys, firsts = np.unique(windows, return_index=True)
+        for key, samples in zip(keys, np.split(latencies, firsts[1:])):
+            pending.setdefault(int(key), []).append(samples)
+
+        closed = int(np.floor((newest - start_time - lateness_secs) / window_secs))
+        while next_window < closed:
+            yield summarise(next_window, window_secs)
+            next_window += 1
+
+    if start_time is None:
+        return
+    last = int(np.floor((newest - start_time) / window_secs))
+    while next_window <= last:
+        covered = window_secs
+        if next_window == last:
+            covered = newest - start_time - last * window_secs
+            if covered < window_secs:
+                print("WARNING: incomplete time bucket [%s, %s) covers %.3f s" % (
+                        last * window_secs, (last + 1) * window_secs, covered))
+                # A single sample at the very start of the window covers no time
+                covered = max(covered, 1e-6)
+        yield summarise(next_window, covered)
+        next_window += 1
+
+    if late:
+        print("WARNING: %d samples arrived more than %s s after their window closed" % (
+                late, lateness_secs))
 
 
 def dumpCSV(statistics, output):
     for time, stat in statistics:
-        output.write("%d,%f,%f," % (time, stat.throughput, stat.average/1000))
+        output.write("%f,%f,%f," % (time, stat.throughput, stat.average/1000))
         output.write(",".join((str(v/1000) for v in stat.percentiles)))
         output.write("\n")
 
 
 def main():
-    if len(sys.argv) != 4:
-        sys.stderr.write("distribution.py [window size (seconds)] [raw latency log csv] [output]\n")
-        sys.exit(1)
-
-    window_secs = int(sys.argv[1])
-    input_path = sys.argv[2]
-    output_path = sys.argv[3]
-
-    if os.path.exists(output_path):
-        os.remove(output_path)
+    parser = argparse.ArgumentParser(
+        description="Per-window throughput and latency percentiles of a raw latency log")
+    parser.add_argument("window_secs", type=float, help="window size (seconds)")
+    parser.add_argument("input_path", help="raw latency log csv, - for stdin")
+    parser.add_argument("output_path", help="output csv")
+    parser.add_argument("--lateness", type=float, default=None,
+                        help="seconds a sample may start after newer ones (default: one window)")
+    args = parser.parse_args()
+
+    if os.path.exists(args.output_path):
+        os.remove(args.output_path)
 
-    #File read
-    input_iterator = CSVIterator(input_path)
-    start_time_us = input_iterator.next()[0]
-    
     #Computation
-    windowed = timeBucket(input_iterator, start_time_us, window_secs)
-    
+    windowed = timeBucket(CSVChunks(args.input_path), args.window_secs,
+                          args.lateness)
+
     #Output
-    output = open(output_path, "w")
+    output = open(args.output_path, "w")
     dumpCSV(windowed, output)
     output.close()
 
 
 if __name__ == "__main__":
     main()
-
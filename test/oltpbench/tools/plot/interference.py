@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Interference of CH-benCHmark queries with the TPCC transactions of a mixed run
+
+Every execution of an OLAP query is an interval [start, start + latency).
+For each query Q1-Q22 the intervals of all its executions are merged into
+the windows in which that query was running, and the OLTP transactions are
+joined against them:
+
+- throughput: transactions of a type that started inside the windows, per
+  second of window time
+- latency: transactions of a type whose execution overlapped the windows
+
+Both are compared to a baseline, the pure TPCC run of the same storage
+variant if there is one, otherwise the parts of the mixed run in which no
+OLAP query was running. Queries on different OLAP terminals overlap, so a
+window of one query may also contain others.
+
+Usage:
+  ./interference.py netCAS=MIXED.raw,TPCC.raw openCAS=MIXED.raw,TPCC.raw
+  ./interference.py --manifest ../../results/mix_vs_single/manifest.json
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+import rawtrace
+from rawtrace import group_stats
+
+# Transaction type indexes of a mixed tpcc,chbenchmark run
+OLTP_RANGE = (2, 6)
+OLAP_RANGE = (7, 28)
+OLTP_NAMES = ('NewOrder', 'Payment', 'OrderStatus', 'Delivery', 'StockLevel')
+TAIL_PERCENTILE = 99
+
+COLUMNS = ('variant', 'transaction', 'query', 'executions', 'window_secs',
+           'transactions', 'throughput', 'baseline_throughput',
+           'throughput_loss', 'p%s' % TAIL_PERCENTILE,
+           'baseline_p%s' % TAIL_PERCENTILE, 'tail_inflation')
+
+
+def merge_intervals(starts, ends):
+    """Returns the union of the intervals [starts[i], ends[i]) as sorted,
+    disjoint (starts, ends) arrays"""
+    if not len(starts):
+        return np.empty(0), np.empty(0)
+    order = np.argsort(starts, kind='mergesort')
+    starts = starts[order]
+    ends = np.maximum.accumulate(ends[order])
+    # A new window begins where an interval starts after all earlier ones ended
+    first = np.concatenate(([True], starts[1:] > ends[:-1]))
+    last = np.concatenate((first[1:], [True]))
+    return starts[first], ends[last]
+
+
+def overlaps(windows, starts, ends):
+    """Returns which of the intervals [starts, ends) overlap the windows"""
+    window_starts, window_ends = windows
+    if not len(window_starts):
+        return np.zeros(len(starts), dtype=bool)
+    # The first window that ends after the interval starts is the only candidate
+    index = np.searchsorted(window_ends, starts, side='right')
+    inside = index < len(window_starts)
+    result = np.zeros(len(starts), dtype=bool)
+    result[inside] = window_starts[index[inside]] < \
+        np.maximum(ends[inside], starts[inside] + 1e-9)
+    return result
+
+
+def contains(windows, times):
+    """Returns which of the times fall inside the windows"""
+    window_starts, window_ends = windows
+    if not len(window_starts):
+        return np.zeros(len(times), dtype=bool)
+    index = np.searchsorted(window_starts, times, side='right') - 1
+    return (index >= 0) & (times < window_ends[np.maximum(index, 0)])
+
+
+def _select(raw, interval):
+    first, last = interval
+    return raw[(raw['type'] >= first) & (raw['type'] <= last)]
+
+
+def _type_stats(types, started, latencies, overlapping, seconds):
+    """Returns {type: (transactions started, throughput, tail latency)}"""
+    starts_by_type = dict((int(t), 0) for t in types)
+    keys, counts = np.unique(started, return_counts=True)
+    starts_by_type.update(zip(keys.tolist(), counts.tolist()))
+    tails = dict((int(t), np.nan) for t in types)
+    keys, stats = group_stats(overlapping, latencies, (TAIL_PERCENTILE,))
+    tails.update(zip(keys.tolist(), stats[:, 5].tolist()))
+    result = {}
+    for t in types:
+        count = starts_by_type[int(t)]
+        result[int(t)] = (count, count / seconds if seconds > 0 else np.nan,
+                          tails[int(t)])
+    return result
+
+
+def interference(mixed, baseline=None, oltp_range=OLTP_RANGE,
+                 olap_range=OLAP_RANGE):
+    """Returns one row (transaction type, query, executions, window seconds,
+    transactions, throughput, baseline throughput, throughput loss, tail
+    latency, baseline tail latency, tail inflation) per OLTP transaction
+    type and OLAP query of a mixed run. Latencies are in seconds."""
+    oltp = _select(mixed, oltp_range)
+    olap = _select(mixed, olap_range)
+    types = np.arange(oltp_range[0], oltp_range[1] + 1)
+    starts = oltp['start']
+    ends = starts + oltp['latency'] / 1e6
+    latencies = oltp['latency'] / 1e6
+
+    olap_ends = olap['start'] + olap['latency'] / 1e6
+    if baseline is not None:
+        base = _select(baseline, oltp_range)
+        duration = float(base['start'].max() - base['start'].min()) \
+            if len(base) else 0.0
+        base_stats = _type_stats(types, base['type'], base['latency'] / 1e6,
+                                 base['type'], duration)
+    else:
+        busy = merge_intervals(olap['start'], olap_ends)
+        quiet_started = ~contains(busy, starts)
+        quiet_overlapping = ~overlaps(busy, starts, ends)
+        quiet = 0.0
+        if len(starts):
+            # Run time not covered by any OLAP query
+            first, last = starts.min(), starts.max()
+            busy_secs = (np.minimum(busy[1], last) -
+                         np.maximum(busy[0], first)).clip(0).sum()
+            quiet = float(last - first - busy_secs)
+        base_stats = _type_stats(types, oltp['type'][quiet_started],
+                                 latencies[quiet_overlapping],
+                                 oltp['type'][quiet_overlapping], quiet)
+
+    rows = []
+    for query in range(olap_range[0], olap_range[1] + 1):
+        executions = olap['type'] == query
+        windows = merge_intervals(olap['start'][executions],
+                                  olap_ends[executions])
+        seconds = float((windows[1] - windows[0]).sum())
+        started = contains(windows, starts)
+        overlapping = overlaps(windows, starts, ends)
+        stats = _type_stats(types, oltp['type'][started],
+                            latencies[overlapping],
+                            oltp['type'][overlapping], seconds)
+        for t in types:
+            count, throughput, tail = stats[int(t)]
+            base_count, base_throughput, base_tail = base_stats[int(t)]
+            rows.append((int(t), query, int(executions.sum()), seconds, count,
+                         throughput, base_throughput,
+                         1 - throughput / base_throughput
+                         if base_throughput else np.nan,
+                         tail, base_tail,
+                         tail / base_tail if base_tail else np.nan))
+    return rows
+
+
+def transaction_name(index, oltp_range=OLTP_RANGE):
+    offset = index - oltp_range[0]
+    if 0 <= offset < len(OLTP_NAMES):
+        return OLTP_NAMES[offset]
+    return str(index)
+
+
+def query_name(index, olap_range=OLAP_RANGE):
+    return "Q%d" % (index - olap_range[0] + 1)
+
+
+def report(variants, output, oltp_range=OLTP_RANGE, olap_range=OLAP_RANGE):
+    """Writes the interference rows of every (variant, mixed raw file,
+    baseline raw file or None) as CSV and returns them"""
+    output.write(",".join(COLUMNS) + "\n")
+    results = []
+    for variant, mixed, baseline in variants:
+        rows = interference(rawtrace.load(mixed),
+                            rawtrace.load(baseline) if baseline else None,
+                            oltp_range, olap_range)
+        for row in rows:
+            row = (variant, transaction_name(row[0], oltp_range),
+                   query_name(row[1], olap_range)) + row[2:]
+            results.append(row)
+            output.write(",".join(str(value) for value in row) + "\n")
+    return results
+
+
+def worst_queries(results, count=5):
+    """Returns, per variant, the queries with the highest mean throughput
+    loss over all transaction types"""
+    worst = {}
+    for variant in sorted(set(row[0] for row in results)):
+        losses = {}
+        for row in results:
+            if row[0] == variant and not np.isnan(row[8]):
+                losses.setdefault(row[2], []).append(row[8])
+        ranked = sorted(((np.mean(values), query)
+                         for query, values in losses.items()), reverse=True)
+        worst[variant] = [(query, loss) for loss, query in ranked[:count]]
+    return worst
+
+
+def manifest_variants(path):
+    """Returns (variant, mixed raw file, baseline raw file) of every MIXED
+    run in a run_mix_vs_single manifest"""
+    directory = os.path.dirname(os.path.abspath(path))
+    with open(path) as manifest:
+        runs = json.load(manifest)['runs'].values()
+
+    def label(entry):
+        if entry.get('split_ratio') is None:
+            return entry['variant']
+        return "%s@%d" % (entry['variant'], entry['split_ratio'])
+
+    baselines = dict((label(entry), os.path.join(directory, entry['raw']))
+                     for entry in runs if entry['name'] == 'TPCC')
+    return sorted((label(entry), os.path.join(directory, entry['raw']),
+                   baselines.get(label(entry)))
+                  for entry in runs if entry['name'] == 'MIXED')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Throughput loss and tail latency inflation of TPCC "
+                    "transactions while CH-benCHmark queries run")
+    parser.add_argument("runs", nargs="*", metavar="VARIANT=MIXED[,TPCC]",
+                        help="raw file of a mixed run and optionally of the "
+                             "pure TPCC run on the same storage variant")
+    parser.add_argument("--manifest", help="manifest.json of run_mix_vs_single")
+    parser.add_argument("-o", "--output", help="CSV file (default: stdout)")
+    args = parser.parse_args()
+
+    variants = []
+    if args.manifest:
+        variants.extend(manifest_variants(args.manifest))
+    for run in args.runs:
+        variant, _, files = run.rpartition("=")
+        files = files.split(",")
+        variants.append((variant or files[0], files[0],
+                         files[1] if len(files) > 1 else None))
+    if not variants:
+        parser.error("no runs given")
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    results = report(variants, output)
+    if args.output:
+        output.close()
+
+    for variant, queries in sorted(worst_queries(results).items()):
+        print("%s: %s" % (variant, ", ".join(
+            "%s %.1f%%" % (query, loss * 100) for query, loss in queries)),
+            file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
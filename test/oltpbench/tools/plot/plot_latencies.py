@@ -10,10 +10,22 @@ import pylab as p
 from matplotlib.ticker import MaxNLocator
 import sys
 
+import rawtrace
+from rawtrace import group_stats, LATENCY_PERCENTILES
+
 SLICE_SIZE = 5
 MAX_THROUGHPUT_TICKS = 10
 
 
+def rolling_mean(data, window):
+    """Returns the trailing mean over window columns of every row of data,
+    averaging over fewer columns at the start"""
+    data = np.atleast_2d(data)
+    sums = np.cumsum(data, axis=1)
+    sums[:, window:] = sums[:, window:] - sums[:, :-window]
+    return sums / np.minimum(np.arange(1, data.shape[1] + 1), window)
+
+
 class LatencyExtractor(object):
     """Analyser for output.raw for latency data"""
 
@@ -22,36 +34,55 @@ class LatencyExtractor(object):
     def __init__(self, filename, output=None):
         self.filename = filename
         self.output = output
-        self.raw = np.genfromtxt(self.filename, delimiter=',')
-        # remove first line as it is invalid
-        self.raw = self.raw[1:]
+        self.raw = rawtrace.load(self.filename)
 
     def extract(self, interval=None):
-        """Parses output.raw and extracts latency data"""
-        queries_column = self.raw[:, 0]
-        queries = np.unique(queries_column)
+        """Extracts latency data per query type of output.raw.
+
+        Returns one row per query type: query, count, mean, min, max,
+        stddev and the LATENCY_PERCENTILES, all latencies in seconds.
+        """
+        raw = self.raw
         if interval:
             first, last = interval
-            interval_queries = xrange(first, last + 1)
-            queries = set(interval_queries).intersection(queries)
-
-        result = []
-
-        for query in queries:
-            l_q = int(query)
-            query_lat = self.raw[:, 2][queries_column == query]
-            result.append([l_q] + self._get_data(query_lat))
-
-        return np.array(result)
-
-    def _get_data(self, data):
-        """Returns count, mean, min and max from a array"""
-        return [len(data), data.mean() / self.CONVERT,
-                data.min() / self.CONVERT, data.max() / self.CONVERT]
+            raw = raw[(raw['type'] >= first) & (raw['type'] <= last)]
+
+        queries, stats = group_stats(raw['type'], raw['latency'])
+        if not len(queries):
+            return np.empty((0, 6 + len(LATENCY_PERCENTILES)))
+        count, mean, std, low, high = stats[:, :5].T
+        return np.column_stack([queries, count, mean / self.CONVERT,
+                                low / self.CONVERT, high / self.CONVERT,
+                                std / self.CONVERT] +
+                               [column / self.CONVERT
+                                for column in stats[:, 5:].T])
+
+    def extract_corrected(self, rate, interval=None, terminals=None):
+        """Extracts raw and coordinated omission corrected latency
+        percentiles per query type of a run limited to rate requests/s.
+
+        Returns one row per query type: query, count, the raw
+        LATENCY_PERCENTILES and the corrected ones, in seconds.
+        """
+        raw = self.raw
+        if interval:
+            first, last = interval
+            raw = raw[(raw['type'] >= first) & (raw['type'] <= last)]
+
+        queries, stats = group_stats(raw['type'], raw['latency'])
+        if not len(queries):
+            return np.empty((0, 2 + 2 * len(LATENCY_PERCENTILES)))
+        corrected = rawtrace.corrected_latencies(raw, rate, terminals)
+        queries, corrected_stats = group_stats(raw['type'], corrected)
+        return np.column_stack([queries, stats[:, 0]] +
+                               [column / self.CONVERT
+                                for column in stats[:, 5:].T] +
+                               [column / self.CONVERT
+                                for column in corrected_stats[:, 5:].T])
 
     def get_ymax(self):
         """Get max latency value for deminsioning of the y axis"""
-        return self.raw[:, 2].max() / self.CONVERT + .1
+        return self.raw['latency'].max() / float(self.CONVERT) + .1
 
     def plot(self, data, ymax=1.5):
         """Takes latency data and plots bar charts"""
@@ -95,38 +126,52 @@ class LatencyExtractor(object):
 class ThroughputExtractor(object):
     """Analyser for output.raw for throughput data"""
 
-    def __init__(self, filename, output=None):
+    def __init__(self, filename, output=None, slice_size=SLICE_SIZE):
         self.filename = filename
         self.output = output
-        raw = np.genfromtxt(self.filename, delimiter=',')
-        # filter the invalid transaction
-        self.raw = raw[1:]
-
-    def extract(self, interval=None):
-        """Parses output.raw and returns throughput data"""
-
-        raw = np.genfromtxt(self.filename, delimiter=',')
-        # filter the invalid transaction
-        raw = raw[1:]
+        self.slice_size = slice_size
+        self.raw = rawtrace.load(self.filename)
+
+    def extract(self, interval=None, slice_size=None, smooth=None):
+        """Returns the requests/s of every slice_size seconds of output.raw,
+        optionally as the trailing mean over smooth slices"""
+        types, throughput = self.extract_per_type(interval, slice_size,
+                                                  smooth)
+        return throughput.sum(axis=0)
+
+    def extract_per_type(self, interval=None, slice_size=None,
+                         smooth=None):
+        """Returns the query types and a row of requests/s per slice_size
+        seconds for each of them
+
+        All slices are binned with one bincount over (type, slice), so the
+        cost does not depend on the number of slices; slices down to 10 ms
+        can be lined up with netCAS split ratio changes.
+        """
+        slice_size = slice_size or self.slice_size
+        raw = self.raw
         if interval:
             first, last = interval
-            raw = self.raw[(self.raw[:, 0] >= first) & \
-                            (self.raw[:, 0] <= last)]
-        else:
-            raw = self.raw
-        test_start = raw[:, 1].min()
-        test_finish = raw[:, 1].max()
-        result = []
+            raw = raw[(raw['type'] >= first) & (raw['type'] <= last)]
+        if not len(raw):
+            return np.empty(0, dtype=np.int32), np.empty((0, 0))
 
-        for time in xrange(0, int(test_finish - test_start), 5):
-            start = time
-            end = time + SLICE_SIZE
-            time_slice = raw[(raw[:, 1] >= start + test_start)
-                             & (raw[:, 1] < end + test_start)][:, 2]
-            throughput = float(len(time_slice)) / SLICE_SIZE
-            result.append(throughput)
+        test_start = raw['start'].min()
+        duration = raw['start'].max() - test_start
+        slices = max(int(np.ceil(duration / slice_size)), 1)
 
-        return np.array(result)
+        index = np.floor((raw['start'] - test_start) /
+                         slice_size).astype(np.int64)
+        types, type_index = np.unique(raw['type'], return_inverse=True)
+        # the last sample starts a slice of its own, drop it like before
+        keep = index < slices
+        counts = np.bincount(type_index.ravel()[keep] * slices + index[keep],
+                             minlength=len(types) * slices)
+        throughput = counts.reshape(len(types), slices) / float(slice_size)
+
+        if smooth and smooth > 1:
+            throughput = rolling_mean(throughput, int(smooth))
+        return types, throughput
 
 
     def plot(self, data):
@@ -135,7 +180,8 @@ class ThroughputExtractor(object):
         title = getattr(self, 'title', None)
 
         subplot = fig.add_subplot(111)
-        ThroughputExtractor.decorate_subplot(subplot, data, title)
+        ThroughputExtractor.decorate_subplot(subplot, data, title,
+                                             slice_size=self.slice_size)
 
         if title:
             p.savefig(self.output)
@@ -143,15 +189,14 @@ class ThroughputExtractor(object):
         p.show()
 
     @staticmethod
-    def decorate_subplot(subplot, data, title=None, label=None):
+    def decorate_subplot(subplot, data, title=None, label=None,
+                         slice_size=SLICE_SIZE):
         """Takes a subplot and adds graph to it"""
 
-        time_intervals = (np.arange(len(data)) * SLICE_SIZE).astype("I")
+        time_intervals = np.arange(len(data)) * slice_size
 
         subplot.plot(time_intervals, data, label=label)
 
-        subplot.set_xticks(time_intervals)
-
         subplot.xaxis.set_major_locator(MaxNLocator(MAX_THROUGHPUT_TICKS))
 
         subplot.set_xlabel("Seconds")
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Loader for the per-transaction samples OLTPBench writes to <output>.raw
+
+A raw file is parsed once per process into a NumPy structured array with
+the columns type (transaction type index), start (seconds), latency
+(microseconds) and worker (-1 when the file has no worker column). The
+array is also saved as <file>.npy next to the raw file and reused as long
+as it is newer than the raw file.
+
+Both layouts are understood: the current one (type, name, start, latency,
+worker, phase, with a header line) and the older one without the
+transaction name (type, start, latency).
+"""
+import os
+
+import numpy as np
+
+DTYPE = np.dtype([('type', '<i4'), ('start', '<f8'), ('latency', '<i8'),
+                  ('worker', '<i4')])
+
+CHUNK_ROWS = 1 << 20
+LATENCY_PERCENTILES = (50, 90, 99, 99.9)
+
+_LOADED = {}
+
+
+def _layout(filename):
+    """Returns (rows to skip, columns of type, start, latency and worker)"""
+    with open(filename) as raw:
+        first = raw.readline()
+    fields = [field.strip() for field in first.split(',')]
+    skip = 0
+    if not fields[0].lstrip('-').isdigit():
+        skip = 1
+        if 'Transaction Name' in fields:
+            return skip, (0, 2, 3, 4)
+        return skip, (0, 1, 2, None)
+    try:
+        float(fields[1])
+    except (IndexError, ValueError):
+        return skip, (0, 2, 3, 4)
+    return skip, (0, 1, 2, None)
+
+
+def _to_records(columns, count):
+    """Packs the parsed type, start, latency (and worker) columns into DTYPE"""
+    records = np.empty(count, dtype=DTYPE)
+    records['type'] = columns[0]
+    records['start'] = columns[1]
+    records['latency'] = columns[2]
+    if len(columns) > 3:
+        records['worker'] = columns[3]
+    else:
+        records['worker'] = -1
+    return records
+
+
+def _parse(filename):
+    """Parses a raw file with the C CSV reader of pandas, or NumPy without it"""
+    skip, usecols = _layout(filename)
+    usecols = [column for column in usecols if column is not None]
+    try:
+        import pandas as pd
+    except ImportError:
+        pd = None
+
+    if pd is None:
+        data = np.loadtxt(filename, delimiter=',', skiprows=skip,
+                          usecols=usecols, ndmin=2)
+        return _to_records([data[:, i] for i in range(len(usecols))],
+                           len(data))
+
+    chunks = []
+    reader = pd.read_csv(filename, header=None, skiprows=skip,
+                         usecols=usecols, engine='c', chunksize=CHUNK_ROWS,
+                         skip_blank_lines=True)
+    for chunk in reader:
+        chunk = chunk.dropna()
+        chunks.append(_to_records([chunk[column].values
+                                   for column in usecols], len(chunk)))
+    if not chunks:
+        return np.empty(0, dtype=DTYPE)
+    return np.concatenate(chunks)
+
+
+def load(filename, cache=True):
+    """Returns the samples of a raw file, parsing it at most once"""
+    path = os.path.abspath(filename)
+    stat = os.stat(path)
+    stamp = (stat.st_mtime, stat.st_size)
+    if path in _LOADED and _LOADED[path][0] == stamp:
+        return _LOADED[path][1]
+
+    cache_path = path + '.npy'
+    samples = None
+    if cache and os.path.exists(cache_path) and \
+            os.path.getmtime(cache_path) >= stat.st_mtime:
+        try:
+            samples = np.load(cache_path)
+            if samples.dtype != DTYPE:
+                samples = None
+        except (IOError, OSError, ValueError):
+            samples = None
+
+    if samples is None:
+        samples = _parse(path)
+        if cache:
+            try:
+                np.save(cache_path, samples)
+            except (IOError, OSError):
+                pass
+
+    _LOADED[path] = (stamp, samples)
+    return samples
+
+
+def group_stats(keys, values, percentiles=LATENCY_PERCENTILES):
+    """Returns the distinct keys and, per key, the count, mean, standard
+    deviation, min, max and the interpolated percentiles of values.
+
+    One pass of np.unique/bincount gives the moments, one sort by key and
+    value gives min, max and the percentiles of every group at once.
+    """
+    groups, inverse = np.unique(keys, return_inverse=True)
+    inverse = inverse.ravel()
+    values = np.asarray(values, dtype=np.float64)
+    if not len(groups):
+        return groups, np.empty((0, 5 + len(percentiles)))
+
+    counts = np.bincount(inverse)
+    means = np.bincount(inverse, weights=values) / counts
+    deviations = values - means[inverse]
+    stds = np.sqrt(np.bincount(inverse, weights=deviations * deviations) /
+                   counts)
+
+    ordered = values[np.lexsort((values, inverse))]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    columns = [counts, means, stds, ordered[starts],
+               ordered[starts + counts - 1]]
+    for percentile in percentiles:
+        rank = (counts - 1) * (percentile / 100.0)
+        lower = np.floor(rank).astype(np.int64)
+        upper = np.minimum(lower + 1, counts - 1)
+        fraction = rank - lower
+        columns.append(ordered[starts + lower] * (1 - fraction) +
+                       ordered[starts + upper] * fraction)
+    return groups, np.column_stack(columns)
+
+
+def intended_starts(samples, rate, terminals=None):
+    """Returns the time every sample was scheduled to start at a rate
+    limit of rate requests/s, in seconds
+
+    OLTPBench spreads the rate over the terminals of a benchmark, so every
+    worker is scheduled at rate / terminals requests/s from its first
+    request on. A request that started late because the worker was still
+    waiting for the previous one (coordinated omission) gets its scheduled
+    time back; terminals defaults to the number of workers in samples.
+    Without a worker column all samples share one schedule.
+    """
+    starts = samples['start']
+    if not len(samples):
+        return starts.copy()
+    workers = samples['worker']
+    if (workers < 0).all():
+        workers = np.zeros(len(samples), dtype=np.int32)
+        terminals = 1
+    ids, inverse = np.unique(workers, return_inverse=True)
+    inverse = inverse.ravel()
+    if terminals is None:
+        terminals = len(ids)
+    interval = terminals / float(rate)
+
+    # Rank of every sample among those of its worker, in start order
+    order = np.lexsort((starts, inverse))
+    counts = np.bincount(inverse)
+    firsts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    worker = inverse[order]
+    rank = np.arange(len(samples)) - firsts[worker]
+
+    intended = np.empty(len(samples))
+    intended[order] = starts[order][firsts][worker] + rank * interval
+    # A worker ahead of its schedule waited, it did not start early
+    return np.minimum(intended, starts)
+
+
+def corrected_latencies(samples, rate, terminals=None):
+    """Returns the latency of every sample measured from its intended start
+    (see intended_starts), in microseconds"""
+    delay = samples['start'] - intended_starts(samples, rate, terminals)
+    return samples['latency'] + np.rint(delay * 10 ** 6).astype(np.int64)
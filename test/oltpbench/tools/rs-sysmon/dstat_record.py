@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""
+Loader for dstat binary recordings (dstat --record file)
+
+A recording is a header ('<8sHHII': magic, version, codec, columns, schema
+length), a schema of "type name" lines (q = int64, d = float64) and packed
+little-endian rows. Compressed recordings store the rows in blocks, each
+prefixed by '<II' (compressed length, rows).
+"""
+
+import sys
+import zlib
+import struct
+import argparse
+
+import numpy as np
+
+RECORD_MAGIC = b'DSTATREC'
+HEADER = struct.Struct('<8sHHII')
+BLOCK = struct.Struct('<II')
+CODECS = {0: None, 1: 'zlib', 2: 'zstd'}
+TYPES = {'q': '<i8', 'd': '<f8'}
+
+
+def decompressor(codec):
+    if codec == 'zlib':
+        return zlib.decompress
+    if codec == 'zstd':
+        try:
+            import zstandard
+            return zstandard.ZstdDecompressor().decompress
+        except ImportError:
+            import zstd
+            return zstd.decompress
+    return None
+
+
+def read_header(data):
+    """Return (codec, dtype, offset of the first row) of a recording"""
+    if len(data) < HEADER.size:
+        raise ValueError("file too short for a dstat recording")
+    magic, version, codec, ncols, schema_len = HEADER.unpack_from(data, 0)
+    if magic != RECORD_MAGIC:
+        raise ValueError("not a dstat recording")
+    if version != 1:
+        raise ValueError("unsupported recording version %d" % version)
+    if codec not in CODECS:
+        raise ValueError("unknown codec %d" % codec)
+
+    schema = data[HEADER.size:HEADER.size + schema_len].decode('utf-8', 'replace')
+    fields = []
+    for line in schema.splitlines():
+        kind, name = line.split(' ', 1)
+        fields.append((name, TYPES[kind]))
+    if len(fields) != ncols:
+        raise ValueError("schema lists %d columns, header says %d" % (len(fields), ncols))
+    return CODECS[codec], np.dtype(fields), HEADER.size + schema_len
+
+
+def load_array(path):
+    """Load a recording as a NumPy structured array, one record per sample"""
+    with open(path, 'rb') as fd:
+        data = fd.read()
+    codec, dtype, offset = read_header(data)
+
+    # A recording cut short by a crash ends in a partial row or block, which is dropped
+    if codec is None:
+        count = (len(data) - offset) // dtype.itemsize
+        return np.frombuffer(data, dtype, count=count, offset=offset)
+
+    decompress = decompressor(codec)
+    chunks = []
+    while offset + BLOCK.size <= len(data):
+        size, rows = BLOCK.unpack_from(data, offset)
+        offset += BLOCK.size
+        if offset + size > len(data):
+            break
+        chunks.append(decompress(data[offset:offset + size])[:rows * dtype.itemsize])
+        offset += size
+    return np.frombuffer(b''.join(chunks), dtype)
+
+
+def load(path, frame=True):
+    """Load a recording as a pandas DataFrame (or a structured array without pandas)"""
+    rows = load_array(path)
+    if not frame:
+        return rows
+    try:
+        import pandas as pd
+    except ImportError:
+        return rows
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect or convert a dstat binary recording')
+    parser.add_argument('recording', help='File written by dstat --record')
+    parser.add_argument('-o', '--output', help='Write the samples to this CSV file')
+
+    args = parser.parse_args()
+
+    try:
+        rows = load_array(args.recording)
+    except (IOError, OSError, ValueError) as e:
+        print("Error: Could not load %s: %s" % (args.recording, e))
+        return 1
+
+    print("%s: %d samples, %d columns" % (args.recording, len(rows), len(rows.dtype.names)))
+    if len(rows):
+        print("Duration: %.1f s" % (rows['time'][-1] - rows['time'][0]))
+
+    if args.output:
+        header = ','.join('"%s"' % name for name in rows.dtype.names)
+        np.savetxt(args.output, np.column_stack([rows[name] for name in rows.dtype.names]),
+                   delimiter=',', header=header, comments='', fmt='%.6f')
+        print("Samples saved to %s" % args.output)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+### Dstat extended block device statistics plugin
+### Displays the iostat -x view of every block device from the shared diskstats snapshot
+###
+### Devices can be selected and grouped with -D and --diskset like the dsk
+### stats, e.g. --disk-iostat -D cas1-1,pmem0,nvme --diskset nvme:nvme[0-9]+n[0-9]+
+
+class dstat_plugin(dstat):
+    """
+    Extended statistics for block devices, equivalent to iostat -x.
+
+    Reads and writes per second, average read and write latency in ms
+    (r_await, w_await), average request size in bytes (rareq-sz, wareq-sz),
+    average number of requests in flight (aqu-sz) and the percentage of time
+    the device was busy (%util, averaged over the members of a diskset).
+    """
+
+    def __init__(self):
+        self.nick = ('reads', 'writs', 'rawt', 'wawt', 'rsz', 'wsz', 'aqu', 'util')
+        self.type = 'f'
+        self.width = 5
+        self.scale = 1000
+        self.diskfilter = re.compile('^(dm-[0-9]+|md[0-9]+|[hsv]d[a-z]+[0-9]+|nvme[0-9]+n[0-9]+p[0-9]+|loop[0-9]+|ram[0-9]+)$')
+        self.cols = 8
+
+    def discover(self, *objlist):
+        ret = []
+        for name, c in proc_diskstats().items():
+            if c[:11] == [0,] * 11: continue
+            ret.append(name)
+        ret.sort()
+        for item in objlist: ret.append(item)
+        if not ret:
+            raise Exception, "No suitable block devices found to monitor"
+        return ret
+
+    def vars(self):
+        ret = []
+        if op.disklist:
+            varlist = op.disklist
+        else:
+            varlist = []
+            blockdevices = [os.path.basename(filename) for filename in glob.glob('/sys/block/*')]
+            for name in self.discover:
+                if self.diskfilter.match(name): continue
+                if name not in blockdevices: continue
+                varlist.append(name)
+        for name in varlist:
+            if name in self.discover + ['total'] + op.diskset.keys():
+                ret.append(name)
+        return ret
+
+    def name(self):
+        return ['dsk/'+name for name in self.vars]
+
+    def counters(self, stats, disks):
+        "Sum the reads, read sectors, read ms, writes, write sectors, write ms, busy ms and weighted ms of disks"
+        ret = [0] * 8
+        for disk in disks:
+            c = stats[disk]
+            for i, j in enumerate((0, 2, 3, 4, 6, 7, 9, 10)):
+                ret[i] = ret[i] + c[j]
+        return ret
+
+    def extract(self):
+        stats = proc_diskstats()
+        for name in self.vars:
+            if name == 'total':
+                disks = [ disk for disk in stats.keys() if not self.diskfilter.match(disk) ]
+            elif name in op.diskset.keys():
+                disks = proc_disksets()[name]
+            elif name in stats:
+                disks = [ name ]
+            else:
+                disks = []
+            self.set2[name] = self.counters(stats, disks)
+
+            d = [ self.set2[name][i] - self.set1[name][i] for i in range(8) ]
+            reads, rsect, rms, writes, wsect, wms, busy, weighted = d
+            self.val[name][0] = reads * 1.0 / elapsed
+            self.val[name][1] = writes * 1.0 / elapsed
+            self.val[name][2] = self.val[name][3] = self.val[name][4] = self.val[name][5] = 0
+            if reads:
+                self.val[name][2] = rms * 1.0 / reads
+                self.val[name][4] = rsect * 512.0 / reads
+            if writes:
+                self.val[name][3] = wms * 1.0 / writes
+                self.val[name][5] = wsect * 512.0 / writes
+            self.val[name][6] = weighted / 1000.0 / elapsed
+            self.val[name][7] = busy / 10.0 / elapsed / max(len(disks), 1)
+
+        if step == op.delay:
+            self.set1.update(self.set2)
+
+# vim:ts=4:sw=4:et
@@ -53,21 +53,20 @@ class dstat_plugin(dstat):
         return ['dsk/'+name for name in self.vars]
 
     def extract(self):
+        stats = proc_diskstats()
         for name in self.vars: self.set2[name] = (0, 0)
-        for l in self.splitlines():
-            if len(l) < 13: continue
-            if l[3] == '0' and l[7] == '0': continue
-            name = l[2]
-            if l[3:] == ['0',] * 11: continue
-            if not self.diskfilter.match(name):
-                self.set2['total'] = ( self.set2['total'][0] + long(l[3]), self.set2['total'][1] + long(l[7]) )
-            if name in self.vars and name != 'total':
-                self.set2[name] = ( self.set2[name][0] + long(l[3]), self.set2[name][1] + long(l[7]))
-            for diskset in self.vars:
-                if diskset in op.diskset.keys():
-                    for disk in op.diskset[diskset]:
-                        if re.match('^'+disk+'$', name):
-                            self.set2[diskset] = ( self.set2[diskset][0] + long(l[3]), self.set2[diskset][1] + long(l[7]) )
+        if 'total' in self.vars:
+            for name, c in stats.items():
+                if self.diskfilter.match(name): continue
+                self.set2['total'] = ( self.set2['total'][0] + c[0], self.set2['total'][1] + c[4] )
+        for name in self.vars:
+            if name == 'total': continue
+            if name in op.diskset.keys():
+                for disk in proc_disksets()[name]:
+                    c = stats[disk]
+                    self.set2[name] = ( self.set2[name][0] + c[0], self.set2[name][1] + c[4] )
+            elif name in stats:
+                self.set2[name] = ( stats[name][0], stats[name][4] )
         for name in self.set2.keys():
             self.val[name] = (
                 (self.set2[name][0] - self.set1[name][0]) / elapsed,
@@ -52,14 +52,12 @@ class dstat_plugin(dstat):
         return self.vars
 
     def extract(self):
-        for name in self.vars: self.set2[name] = (0, )
-        for l in self.splitlines():
-            if len(l) < 13: continue
-            if l[5] == '0' and l[9] == '0': continue
-            name = l[2]
-            if l[3:] == ['0',] * 11: continue
-            if name in self.vars:
-                self.set2[name] = ( self.set2[name][0] + long(l[12]), )
+        stats = proc_diskstats()
+        for name in self.vars:
+            if name in stats:
+                self.set2[name] = ( stats[name][9], )
+            else:
+                self.set2[name] = (0, )
         for name in self.set2.keys():
             self.val[name] = (
                 (self.set2[name][0] - self.set1[name][0]) * 1.0 * hz / elapsed / 1000,
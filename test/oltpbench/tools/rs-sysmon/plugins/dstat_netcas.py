@@ -0,0 +1,198 @@
+### Dstat netCAS plugin
+### Displays the netCAS splitter state next to RDMA and OpenCAS statistics
+###
+### rdma/lat come from the nvme-rdma rdma_metrics files, mode/ratio from the
+### latest "netCAS: Current metrics" kernel log line, cach/back from the
+### diskstats of the cache and core devices and hit% from casadm -P, which a
+### background loop runs every NETCAS_CASADM_INTERVAL seconds rather than
+### every tick.
+###
+### Environment:
+###   RDMA_METRICS_DIR        rdma_metrics directory (default: /sys/kernel/rdma_metrics)
+###   NETCAS_KMSG             kernel log to follow (default: /dev/kmsg)
+###   NETCAS_CACHE_ID         OpenCAS cache instance (default: 1)
+###   NETCAS_CASADM_INTERVAL  seconds between casadm -P runs (default: 10)
+###   NETCAS_CACHE_DEV        cache device name, when casadm -L cannot tell (e.g. pmem0)
+###   NETCAS_CORE_DEV         core device name, when casadm -L cannot tell (e.g. nvme0n1)
+
+global netcas_metrics
+netcas_metrics = re.compile('netCAS: Current metrics - .*Mode: (\d+), Split Ratio: ([\d.]+)%')
+
+class dstat_plugin(dstat):
+    """
+    netCAS split ratio and mode next to RDMA throughput/latency and the
+    share of reads served by the cache and the backend device.
+    """
+
+    def __init__(self):
+        self.name = 'netcas'
+        self.nick = ('rdma', 'lat', 'mode', 'ratio', 'hit%', 'cach', 'back')
+        self.vars = ('rdma', 'lat', 'mode', 'ratio', 'hits', 'cache', 'backend')
+        self.type = 'f'
+        self.width = 5
+        self.scale = 1000
+        self.rdmadir = os.getenv('RDMA_METRICS_DIR') or '/sys/kernel/rdma_metrics'
+        self.kmsgpath = os.getenv('NETCAS_KMSG') or '/dev/kmsg'
+        self.cacheid = os.getenv('NETCAS_CACHE_ID') or '1'
+        self.interval = os.getenv('NETCAS_CASADM_INTERVAL') or '10'
+        self.rdmafds = {}
+        self.kmsg = None
+        self.kmsgbuf = ''
+        self.casadm = None
+        self.casreport = []
+        self.casreads = None
+        self.hitratio = -1
+        self.devices = (os.getenv('NETCAS_CACHE_DEV'), os.getenv('NETCAS_CORE_DEV'))
+        self.mode = -1
+        self.ratio = -1
+
+    def check(self):
+        global subprocess, signal
+        import subprocess, signal
+
+        if not self.devices[0] or not self.devices[1]:
+            self.devices = self.casdevices()
+        sources = 0
+        if os.access(os.path.join(self.rdmadir, 'throughput'), os.R_OK): sources = sources + 1
+        if self.devices[0] and self.devices[1]: sources = sources + 1
+        try:
+            self.kmsg = os.open(self.kmsgpath, os.O_RDONLY | os.O_NONBLOCK)
+            os.lseek(self.kmsg, 0, 2)
+            self.kmsgfile = os.path.isfile(self.kmsgpath)
+            sources = sources + 1
+        except OSError:
+            self.kmsg = None
+        if not sources:
+            raise Exception, 'No rdma_metrics, kernel log or OpenCAS devices to monitor'
+
+        ### One long-running loop refreshes casadm -P, the plugin only drains its pipe
+        found = False
+        for path in (os.getenv('PATH') or '').split(':') + [ '/sbin', '/usr/sbin' ]:
+            if os.access(os.path.join(path, 'casadm'), os.X_OK): found = True
+        if not found: return
+        try:
+            self.casadm = subprocess.Popen(['sh', '-c', 'while :; do casadm -P -i %s -o csv 2>/dev/null; echo; sleep %s; done' % (self.cacheid, self.interval)],
+                stdout=subprocess.PIPE, stderr=open(os.devnull, 'w'), close_fds=True, preexec_fn=self.casadmchild)
+            self.casadmpipe = pipereader(self.casadm.stdout)
+        except OSError:
+            self.casadm = None
+            return
+        import atexit
+        atexit.register(self.stopcasadm)
+
+    def casadmchild(self):
+        "Run the casadm loop in its own process group, and let it die with the pipe if dstat is killed"
+        os.setsid()
+        signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+
+    def stopcasadm(self):
+        "Stop the casadm loop, including the casadm or sleep it is running"
+        try:
+            os.killpg(self.casadm.pid, signal.SIGTERM)
+        except OSError:
+            pass
+        self.casadm.wait()
+
+    def casdevices(self):
+        "Return (cache device, core device) names of the cache instance from casadm -L"
+        cache, core = None, None
+        try:
+            pipe = subprocess.Popen(['casadm', '-L', '-o', 'csv'], stdout=subprocess.PIPE, stderr=open(os.devnull, 'w'))
+            output = pipe.communicate()[0]
+        except OSError:
+            return cache, core
+        current = None
+        for line in output.splitlines():
+            l = line.split(',')
+            if len(l) < 3: continue
+            if l[0] == 'cache':
+                current = l[1]
+                if current == self.cacheid:
+                    cache = os.path.basename(os.path.realpath(l[2]))
+            elif l[0] == 'core' and current == self.cacheid and not core:
+                core = os.path.basename(os.path.realpath(l[2]))
+        return cache, core
+
+    def readrdma(self, name):
+        if not self.rdmafds.has_key(name):
+            self.rdmafds[name] = os.open(os.path.join(self.rdmadir, name), os.O_RDONLY)
+        return long(readfd(self.rdmafds[name]).split()[0])
+
+    def readkmsg(self):
+        "Drain the kernel log records written since the last tick, keeping the latest netCAS state"
+        while True:
+            try:
+                data = os.read(self.kmsg, 8192)
+            except OSError, e:
+                if e.errno == errno.EPIPE:
+                    ### Records were overwritten before we read them, continue with the next one
+                    continue
+                break
+            if not data: break
+            if self.kmsgfile:
+                lines = (self.kmsgbuf + data).split('\n')
+                self.kmsgbuf = lines.pop()
+            else:
+                lines = [ data, ]
+            for line in lines:
+                match = netcas_metrics.search(line)
+                if match:
+                    self.mode = int(match.group(1))
+                    self.ratio = float(match.group(2))
+
+    def readcasadm(self):
+        "Parse the newest complete casadm -P report from the background loop"
+        for line in self.casadmpipe.readlines():
+            if line.strip():
+                self.casreport.append(line)
+                continue
+            lines, self.casreport = self.casreport, []
+            if len(lines) < 2: continue
+            stats = {}
+            for column, value in zip(lines[0].split(','), lines[1].split(',')):
+                try:
+                    stats[column.strip()] = float(value)
+                except ValueError:
+                    continue
+            if not stats.has_key('Read total [Requests]'): continue
+
+            ### Hit ratio over the last casadm interval, cumulative for the first report
+            reads = (stats.get('Read hits [Requests]', 0), stats['Read total [Requests]'])
+            last = self.casreads or (0, 0)
+            if reads[1] > last[1]:
+                self.hitratio = (reads[0] - last[0]) * 100.0 / (reads[1] - last[1])
+            self.casreads = reads
+
+    def extract(self):
+        try:
+            self.val['rdma'] = self.readrdma('throughput')
+            self.val['lat'] = self.readrdma('latency')
+        except (OSError, ValueError, IndexError):
+            ### Module not loaded (yet) or reloaded, reopen on the next tick
+            for fd in self.rdmafds.values():
+                os.close(fd)
+            self.rdmafds = {}
+            self.val['rdma'] = self.val['lat'] = -1
+
+        if self.kmsg is not None:
+            self.readkmsg()
+        self.val['mode'] = self.mode
+        self.val['ratio'] = self.ratio
+
+        if self.casadm:
+            self.readcasadm()
+        self.val['hits'] = self.hitratio
+
+        ### Reads completed by the cache and the core device, whatever the splitter decided
+        stats = proc_diskstats()
+        for name, device in (('cache', self.devices[0]), ('backend', self.devices[1])):
+            if device and stats.has_key(device):
+                self.set2[name] = stats[device][0]
+                self.val[name] = (self.set2[name] - self.set1[name]) * 1.0 / elapsed
+            else:
+                self.val[name] = -1
+
+        if step == op.delay:
+            self.set1.update(self.set2)
+
+# vim:ts=4:sw=4:et
@@ -0,0 +1,119 @@
+### Dstat PostgreSQL plugin
+### Displays database activity from pg_stat_database
+###
+### Environment:
+###   DSTAT_PGSQL_HOST  server (default: localhost)
+###   DSTAT_PGSQL_PORT  port (default: 5432)
+###   DSTAT_PGSQL_USER  user (default: $USER)
+###   DSTAT_PGSQL_PWD   password
+###   DSTAT_PGSQL_DB    database to report on (default: tpcc)
+###   DSTAT_PGSQL_VARS  comma separated pg_stat_database columns to show
+
+global pgsql_host
+pgsql_host = os.getenv('DSTAT_PGSQL_HOST') or 'localhost'
+
+global pgsql_port
+pgsql_port = os.getenv('DSTAT_PGSQL_PORT') or '5432'
+
+global pgsql_user
+pgsql_user = os.getenv('DSTAT_PGSQL_USER') or os.getenv('USER')
+
+global pgsql_pwd
+pgsql_pwd = os.getenv('DSTAT_PGSQL_PWD')
+
+global pgsql_db
+pgsql_db = os.getenv('DSTAT_PGSQL_DB') or 'tpcc'
+
+global pgsql_vars
+pgsql_vars = os.getenv('DSTAT_PGSQL_VARS')
+
+class dstat_plugin(dstat):
+    """
+    Transactions, block reads and hits, tuples returned, fetched, inserted,
+    updated and deleted, temporary file bytes and deadlocks per second of
+    a PostgreSQL database, and the number of connected backends.
+
+    The statistics are queried in a background thread over one connection,
+    a slow server shows the last values instead of delaying the tick.
+    """
+
+    ### Column: nick, everything but numbackends counts up
+    nicks = {
+        'numbackends': 'conn',
+        'xact_commit': 'comt',
+        'xact_rollback': 'rbck',
+        'blks_read': 'bread',
+        'blks_hit': 'bhit',
+        'tup_returned': 'tret',
+        'tup_fetched': 'tfet',
+        'tup_inserted': 'tins',
+        'tup_updated': 'tupd',
+        'tup_deleted': 'tdel',
+        'temp_bytes': 'tmpB',
+        'deadlocks': 'dlck',
+    }
+    gauges = ('numbackends', )
+
+    def __init__(self):
+        self.name = 'pgsql ' + pgsql_db
+        self.vars = ('numbackends', 'xact_commit', 'xact_rollback', 'blks_read', 'blks_hit', 'tup_returned',
+                     'tup_fetched', 'tup_inserted', 'tup_updated', 'tup_deleted', 'temp_bytes', 'deadlocks')
+        if pgsql_vars:
+            self.vars = tuple(pgsql_vars.split(','))
+        self.nick = [ self.nicks.get(name, name) for name in self.vars ]
+        self.type = 'f'
+        self.width = 5
+        self.scale = 1000
+        self.index = None
+        self.last = None
+        self.lastvalues = None
+
+    def check(self):
+        global psycopg2
+        import psycopg2
+        try:
+            db = self.connect()
+        except:
+            raise Exception, 'Cannot interface with PostgreSQL server'
+        self.poller = dbpoller(self.connect, "SELECT * FROM pg_stat_database WHERE datname = current_database();", db)
+
+    def connect(self):
+        return psycopg2.connect(host=pgsql_host, port=int(pgsql_port), user=pgsql_user, password=pgsql_pwd,
+                                dbname=pgsql_db, connect_timeout=5)
+
+    def extract(self):
+        result = self.poller.poll()
+        if result is None or self.poller.error or not result[2]:
+            for name in self.vars:
+                self.val[name] = -1
+            return
+        if result is self.last:
+            return
+
+        stamp, columns, rows = result
+        ### Resolve the selected columns once, the view does not change while connected
+        if self.index is None:
+            self.index = {}
+            for name in self.vars:
+                if name in columns:
+                    self.index[name] = columns.index(name)
+        values = {}
+        for name, i in self.index.items():
+            try:
+                values[name] = float(rows[0][i])
+            except (TypeError, ValueError):
+                pass
+
+        for name in self.vars:
+            if not values.has_key(name):
+                self.val[name] = -1
+            elif name in self.gauges:
+                self.val[name] = values[name]
+            elif self.lastvalues and self.lastvalues.has_key(name) and stamp > self.last[0]:
+                self.val[name] = (values[name] - self.lastvalues[name]) / (stamp - self.last[0])
+            else:
+                self.val[name] = -1
+        self.last = result
+        self.lastvalues = values
+
+# vim:ts=4:sw=4:et
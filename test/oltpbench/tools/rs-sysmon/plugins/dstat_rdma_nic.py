@@ -0,0 +1,89 @@
+### Dstat RDMA NIC counter plugin
+### Displays RDMA traffic and congestion counters per device and port
+###
+### Counters come from /sys/class/infiniband/<dev>/ports/<port>/counters and
+### hw_counters (RDMA_SYSFS_ROOT overrides the directory). Every counter file
+### stays open and is re-read from offset 0 each tick. Counters a port does
+### not have show as a dash.
+
+class dstat_plugin(dstat):
+    """
+    RDMA bytes received/sent per second, the time the port waited to
+    transmit (port_xmit_wait ticks per second) and the congestion
+    notifications handled (cnp) and ECN marked packets (ecn) per second.
+    """
+
+    ### Column: (nick, directory, counter file, multiplier)
+    counters = (
+        ('recv', 'counters', 'port_rcv_data', 4),
+        ('send', 'counters', 'port_xmit_data', 4),
+        ('wait', 'counters', 'port_xmit_wait', 1),
+        ('cnp', 'hw_counters', 'rp_cnp_handled', 1),
+        ('ecn', 'hw_counters', 'np_ecn_marked_roce_packets', 1),
+    )
+
+    def __init__(self):
+        self.nick = [ nick for nick, dir, file, mult in self.counters ]
+        self.type = 'f'
+        self.width = 5
+        self.scale = 1000
+        self.root = os.getenv('RDMA_SYSFS_ROOT') or '/sys/class/infiniband'
+        self.cols = len(self.counters)
+        self.fds = {}
+
+    def discover(self, *objlist):
+        ret = []
+        for path in glob.glob(os.path.join(self.root, '*', 'ports', '*', 'counters')):
+            port = os.path.dirname(path)
+            device = os.path.basename(os.path.dirname(os.path.dirname(port)))
+            ret.append('%s:%s' % (device, os.path.basename(port)))
+        ret.sort()
+        for item in objlist: ret.append(item)
+        return ret
+
+    def check(self):
+        if not glob.glob(os.path.join(self.root, '*', 'ports', '*', 'counters')):
+            raise Exception, 'No RDMA devices with port counters found in %s' % self.root
+
+    def vars(self):
+        return self.discover
+
+    def name(self):
+        return [ 'rdma/' + name for name in self.vars ]
+
+    def open(self, name):
+        "Open the counter files of a device port once, counters the port lacks keep None"
+        device, port = name.split(':')
+        fds = []
+        for nick, dir, file, mult in self.counters:
+            try:
+                fds.append(os.open(os.path.join(self.root, device, 'ports', port, dir, file), os.O_RDONLY))
+            except OSError:
+                fds.append(None)
+        self.fds[name] = fds
+
+    def extract(self):
+        for name in self.vars:
+            if not self.fds.has_key(name):
+                self.open(name)
+            values = []
+            for fd, (nick, dir, file, mult) in zip(self.fds[name], self.counters):
+                if fd is None:
+                    values.append(-1)
+                    continue
+                try:
+                    values.append(long(readfd(fd)) * mult)
+                except (OSError, ValueError):
+                    values.append(-1)
+            self.set2[name] = values
+
+            for i in range(self.cols):
+                if values[i] < 0 or self.set1[name][i] < 0:
+                    self.val[name][i] = -1
+                else:
+                    self.val[name][i] = (values[i] - self.set1[name][i]) * 1.0 / elapsed
+
+        if step == op.delay:
+            self.set1.update(self.set2)
+
+# vim:ts=4:sw=4:et
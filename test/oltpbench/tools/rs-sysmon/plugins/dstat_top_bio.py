@@ -8,7 +8,7 @@ class dstat_plugin(dstat):
     """
     def __init__(self):
         self.name = 'most expensive'
-        self.vars = ('block i/o process',)
+        self.vars = topvars('block i/o process')
         self.type = 's'
         self.width = 22
         self.scale = 0
@@ -19,8 +19,7 @@ class dstat_plugin(dstat):
             raise Exception, 'Kernel has no I/O accounting, use at least 2.6.20'
 
     def extract(self):
-        self.val['usage'] = 0.0
-        self.val['block i/o process'] = ''
+        ranking = []
         for pid in proc_pidlist():
             try:
                 ### Reset values
@@ -30,12 +29,12 @@ class dstat_plugin(dstat):
                     self.pidset1[pid] = {'read_bytes:': 0, 'write_bytes:': 0}
 
                 ### Extract name
-                name = proc_splitline('/proc/%s/stat' % pid)[1][1:-1]
+                name = proc_pidstat(pid)[1]
 
                 ### Extract counters
-                for l in proc_splitlines('/proc/%s/io' % pid):
+                for l in proc_pidsplitlines(pid, 'io'):
                     if len(l) != 2: continue
-                    self.pidset2[pid][l[0]] = int(l[1])
+                    self.pidset2[pid][l[0]] = long(l[1])
             except IOError:
                 continue
             except IndexError:
@@ -43,28 +42,28 @@ class dstat_plugin(dstat):
 
             read_usage = (self.pidset2[pid]['read_bytes:'] - self.pidset1[pid]['read_bytes:']) * 1.0 / elapsed
             write_usage = (self.pidset2[pid]['write_bytes:'] - self.pidset1[pid]['write_bytes:']) * 1.0 / elapsed
-            usage = read_usage + write_usage
+            ranking.append((read_usage + write_usage, pid, name, read_usage, write_usage))
+        pidprune(self.pidset1, self.pidset2)
 
-            ### Get the process that spends the most jiffies
-            if usage > self.val['usage']:
-                self.val['usage'] = usage
-                self.val['read_usage'] = read_usage
-                self.val['write_usage'] = write_usage
-                self.val['pid'] = pid
-                self.val['name'] = getnamebypid(pid, name)
-#                st = os.stat("/proc/%s" % pid)
+        self.top = []
+        for usage, pid, name, read_usage, write_usage in toplist(ranking, len(self.vars)):
+            self.top.append((getnamebypid(pid, name), read_usage, write_usage))
 
         if step == op.delay:
             for pid in self.pidset2.keys():
                 self.pidset1[pid].update(self.pidset2[pid])
 
-        if self.val['usage'] != 0.0:
-            self.val['block i/o process'] = '%-*s%s %s' % (self.width-11, self.val['name'][0:self.width-11], cprint(self.val['read_usage'], 'd', 5, 1024), cprint(self.val['write_usage'], 'd', 5, 1024))
+        for i, var in enumerate(self.vars):
+            self.val[var] = ''
+            if i < len(self.top):
+                name, read_usage, write_usage = self.top[i]
+                self.val[var] = '%-*s%s %s' % (self.width-11, name[0:self.width-11], cprint(read_usage, 'd', 5, 1024), cprint(write_usage, 'd', 5, 1024))
 
         ### Debug (show PID)
 #        self.val['block i/o process'] = '%*s %-*s' % (5, self.val['pid'], self.width-6, self.val['name'])
 
     def showcsv(self):
-        return '%s / %d:%d' % (self.val['name'], self.val['read_usage'], self.val['write_usage'])
+        ret = [ '%s / %d:%d' % entry for entry in self.top ]
+        return ','.join(ret + [ '', ] * (len(self.vars) - len(ret)))
 
 # vim:ts=4:sw=4:et
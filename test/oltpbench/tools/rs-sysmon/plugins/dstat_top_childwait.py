@@ -8,49 +8,53 @@ global cpunr
 class dstat_plugin(dstat):
     def __init__(self):
         self.name = 'most waiting for'
-        self.vars = ('child process',)
+        self.vars = topvars('child process')
+        self.pidset1 = {}; self.pidset2 = {}
         self.type = 's'
         self.width = 16
         self.scale = 0
 
     def extract(self):
-        self.val['max'] = 0.0
+        ranking = []
         for pid in proc_pidlist():
             try:
-                ### Using dopen() will cause too many open files
-                l = proc_splitline('/proc/%s/stat' % pid)
+                l = proc_pidstat(pid)
             except IOError:
                 continue
 
-            if len(l) < 15: continue
+            if len(l) < 17: continue
 
             ### Reset previous value if it doesn't exist
-            if not self.set1.has_key(pid):
-                self.set1[pid] = 0
+            if not self.pidset1.has_key(pid):
+                self.pidset1[pid] = 0
 
-            self.set2[pid] = int(l[15]) + int(l[16])
-            usage = (self.set2[pid] - self.set1[pid]) * 1.0 / elapsed / cpunr
+            self.pidset2[pid] = long(l[15]) + long(l[16])
+            usage = (self.pidset2[pid] - self.pidset1[pid]) * 1.0 / elapsed / cpunr
+            ranking.append((usage, pid, l[1]))
+        pidprune(self.pidset1, self.pidset2)
 
-            ### Is it a new topper ?
-            if usage <= self.val['max']: continue
-
-            self.val['max'] = usage
-            self.val['name'] = getnamebypid(pid, l[1][1:-1])
-            self.val['pid'] = pid
+        self.top = []
+        for usage, pid, name in toplist(ranking, len(self.vars)):
+            self.top.append((getnamebypid(pid, name), usage))
 
         ### Debug (show PID)
 #       self.val['process'] = '%*s %-*s' % (5, self.val['pid'], self.width-6, self.val['name'])
 
         if step == op.delay:
-            self.set1.update(self.set2)
+            self.pidset1.update(self.pidset2)
 
     def show(self):
-        if self.val['max'] == 0.0:
-            return '%-*s' % (self.width, '')
-        else:
-            return '%s%-*s%s' % (theme['default'], self.width-3, self.val['name'][0:self.width-3], cprint(self.val['max'], 'p', 3, 34))
+        ret = []
+        for i in range(len(self.vars)):
+            if i < len(self.top):
+                name, usage = self.top[i]
+                ret.append('%s%-*s%s' % (theme['default'], self.width-3, name[0:self.width-3], cprint(usage, 'p', 3, 34)))
+            else:
+                ret.append('%-*s' % (self.width, ''))
+        return char['space'].join(ret)
 
     def showcsv(self):
-        return '%s / %d%%' % (self.val['name'], self.val['max'])
+        ret = [ '%s / %d%%' % entry for entry in self.top ]
+        return ','.join(ret + [ '', ] * (len(self.vars) - len(ret)))
 
 # vim:ts=4:sw=4:et
@@ -10,19 +10,17 @@ class dstat_plugin(dstat):
     """
     def __init__(self):
         self.name = 'most expensive'
-        self.vars = ('cpu process',)
+        self.vars = topvars('cpu process')
         self.type = 's'
         self.width = 16
         self.scale = 0
         self.pidset1 = {}; self.pidset2 = {}
 
     def extract(self):
-        self.val['max'] = 0.0
-        self.val['cpu process'] = ''
+        ranking = []
         for pid in proc_pidlist():
             try:
-                ### Using dopen() will cause too many open files
-                l = proc_splitline('/proc/%s/stat' % pid)
+                l = proc_pidstat(pid)
             except IOError:
                 continue
 
@@ -34,19 +32,18 @@ class dstat_plugin(dstat):
 
             self.pidset2[pid] = long(l[13]) + long(l[14])
             usage = (self.pidset2[pid] - self.pidset1[pid]) * 1.0 / elapsed / cpunr
+            ranking.append((usage, pid, l[1]))
+        pidprune(self.pidset1, self.pidset2)
 
-            ### Is it a new topper ?
-            if usage < self.val['max']: continue
+        self.top = []
+        for usage, pid, name in toplist(ranking, len(self.vars)):
+            self.top.append((getnamebypid(pid, name), usage))
 
-            name = l[1][1:-1]
-
-            self.val['max'] = usage
-            self.val['pid'] = pid
-            self.val['name'] = getnamebypid(pid, name)
-#            self.val['name'] = name
-
-        if self.val['max'] != 0.0:
-            self.val['cpu process'] = '%-*s%s' % (self.width-3, self.val['name'][0:self.width-3], cprint(self.val['max'], 'f', 3, 34))
+        for i, var in enumerate(self.vars):
+            self.val[var] = ''
+            if i < len(self.top):
+                name, usage = self.top[i]
+                self.val[var] = '%-*s%s' % (self.width-3, name[0:self.width-3], cprint(usage, 'f', 3, 34))
 
         ### Debug (show PID)
 #        self.val['cpu process'] = '%*s %-*s' % (5, self.val['pid'], self.width-6, self.val['name'])
@@ -55,6 +52,7 @@ class dstat_plugin(dstat):
             self.pidset1.update(self.pidset2)
 
     def showcsv(self):
-        return '%s / %d%%' % (self.val['name'], self.val['max'])
+        ret = [ '%s / %d%%' % entry for entry in self.top ]
+        return ','.join(ret + [ '', ] * (len(self.vars) - len(ret)))
 
 # vim:ts=4:sw=4:et
@@ -18,7 +18,7 @@ class dstat_plugin(dstat):
 
     def __init__(self):
         self.name = 'highest average'
-        self.vars = ('cputime process',)
+        self.vars = topvars('cputime process')
         self.type = 's'
         self.width = 17
         self.scale = 0
@@ -29,8 +29,7 @@ class dstat_plugin(dstat):
             raise Exception, 'Kernel has no scheduler statistics, use at least 2.6.12'
 
     def extract(self):
-        self.val['result'] = 0
-        self.val['cputime process'] = ''
+        ranking = []
         for pid in proc_pidlist():
             try:
                 ### Reset values
@@ -38,10 +37,10 @@ class dstat_plugin(dstat):
                     self.pidset1[pid] = {'run_ticks': 0, 'ran': 0}
 
                 ### Extract name
-                name = proc_splitline('/proc/%s/stat' % pid)[1][1:-1]
+                name = proc_pidstat(pid)[1]
 
                 ### Extract counters
-                l = proc_splitline('/proc/%s/schedstat' % pid)
+                l = proc_pidread(pid, 'schedstat').split()
             except IOError:
                 continue
             except IndexError:
@@ -56,23 +55,28 @@ class dstat_plugin(dstat):
             else:
                 avgrun = 0
 
-            ### Get the process that spends the most jiffies
-            if avgrun > self.val['result']:
-                self.val['result'] = avgrun
-                self.val['pid'] = pid
-                self.val['name'] = getnamebypid(pid, name)
+            ranking.append((avgrun, pid, name))
+        pidprune(self.pidset1, self.pidset2)
+
+        self.top = []
+        for result, pid, name in toplist(ranking, len(self.vars)):
+            self.top.append((getnamebypid(pid, name), result))
 
         if step == op.delay:
             for pid in self.pidset2.keys():
                 self.pidset1[pid].update(self.pidset2[pid])
 
-        if self.val['result'] != 0.0:
-            self.val['cputime process'] = '%-*s%s' % (self.width-4, self.val['name'][0:self.width-4], cprint(self.val['result'], 'f', 4, 100))
+        for i, var in enumerate(self.vars):
+            self.val[var] = ''
+            if i < len(self.top):
+                name, result = self.top[i]
+                self.val[var] = '%-*s%s' % (self.width-4, name[0:self.width-4], cprint(result, 'f', 4, 100))
 
         ### Debug (show PID)
 #       self.val['cputime process'] = '%*s %-*s' % (5, self.val['pid'], self.width-6, self.val['name'])
 
     def showcsv(self):
-        return '%s / %.4f' % (self.val['name'], self.val['result'])
+        ret = [ '%s / %.4f' % entry for entry in self.top ]
+        return ','.join(ret + [ '', ] * (len(self.vars) - len(ret)))
 
 # vim:ts=4:sw=4:et
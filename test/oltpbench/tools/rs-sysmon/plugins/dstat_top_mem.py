@@ -10,36 +10,37 @@ class dstat_plugin(dstat):
     """
     def __init__(self):
         self.name = 'most expensive'
-        self.vars = ('memory process',)
+        self.vars = topvars('memory process')
         self.type = 's'
         self.width = 17
         self.scale = 0
 
     def extract(self):
-        self.val['max'] = 0.0
+        ranking = []
         for pid in proc_pidlist():
             try:
-                ### Using dopen() will cause too many open files
-                l = proc_splitline('/proc/%s/stat' % pid)
+                l = proc_pidstat(pid)
             except IOError:
                 continue
 
-            if len(l) < 23: continue
-            usage = int(l[23]) * pagesize
+            if len(l) < 24: continue
+            ranking.append((long(l[23]) * pagesize, pid, l[1]))
 
-            ### Is it a new topper ?
-            if usage <= self.val['max']: continue
+        self.top = []
+        for usage, pid, name in toplist(ranking, len(self.vars)):
+            self.top.append((getnamebypid(pid, name), usage))
 
-            self.val['max'] = usage
-            self.val['name'] = getnamebypid(pid, l[1][1:-1])
-            self.val['pid'] = pid
-
-        self.val['memory process'] = '%-*s%s' % (self.width-5, self.val['name'][0:self.width-5], cprint(self.val['max'], 'f', 5, 1024))
+        for i, var in enumerate(self.vars):
+            self.val[var] = ''
+            if i < len(self.top):
+                name, usage = self.top[i]
+                self.val[var] = '%-*s%s' % (self.width-5, name[0:self.width-5], cprint(usage, 'f', 5, 1024))
 
         ### Debug (show PID)
 #       self.val['memory process'] = '%*s %-*s' % (5, self.val['pid'], self.width-6, self.val['name'])
 
     def showcsv(self):
-        return '%s / %d%%' % (self.val['name'], self.val['max'])
+        ret = [ '%s / %d' % entry for entry in self.top ]
+        return ','.join(ret + [ '', ] * (len(self.vars) - len(ret)))
 
 # vim:ts=4:sw=4:et
@@ -9,7 +9,7 @@
 class dstat_plugin(dstat):
     def __init__(self):
         self.name = 'out of memory'
-        self.vars = ('kill score',)
+        self.vars = topvars('kill score')
         self.type = 's'
         self.width = 18
         self.scale = 0
@@ -19,37 +19,36 @@ class dstat_plugin(dstat):
             raise Exception, 'Kernel does not support /proc/pid/oom_score, use at least 2.6.11.'
 
     def extract(self):
-        self.val['max'] = 0.0
-        self.val['kill score'] = ''
+        ranking = []
         for pid in proc_pidlist():
             try:
                 ### Extract name
-                name = proc_splitline('/proc/%s/stat' % pid)[1][1:-1]
+                name = proc_pidstat(pid)[1]
 
-                ### Using dopen() will cause too many open files
-                l = proc_splitline('/proc/%s/oom_score' % pid)
+                l = proc_pidread(pid, 'oom_score').split()
             except IOError:
                 continue
             except IndexError:
                 continue
 
             if len(l) < 1: continue
-            oom_score = int(l[0])
+            ranking.append((int(l[0]), pid, name))
 
-            ### Is it a new topper ?
-            if oom_score <= self.val['max']: continue
+        self.top = []
+        for oom_score, pid, name in toplist(ranking, len(self.vars)):
+            self.top.append((getnamebypid(pid, name), oom_score))
 
-            self.val['max'] = oom_score
-            self.val['name'] = getnamebypid(pid, name)
-            self.val['pid'] = pid
-
-        if self.val['max'] != 0.0:
-            self.val['kill score'] = '%-*s%s' % (self.width-4, self.val['name'][0:self.width-4], cprint(self.val['max'], 'f', 4, 1000))
+        for i, var in enumerate(self.vars):
+            self.val[var] = ''
+            if i < len(self.top):
+                name, oom_score = self.top[i]
+                self.val[var] = '%-*s%s' % (self.width-4, name[0:self.width-4], cprint(oom_score, 'f', 4, 1000))
 
         ### Debug (show PID)
 #       self.val['kill score'] = '%*s %-*s' % (5, self.val['pid'], self.width-6, self.val['name'])
 
     def showcsv(self):
-        return '%s / %d%%' % (self.val['name'], self.val['max'])
+        ret = [ '%s / %d' % entry for entry in self.top ]
+        return ','.join(ret + [ '', ] * (len(self.vars) - len(ret)))
 
 # vim:ts=4:sw=4:et
@@ -4,19 +4,35 @@
 Wrapper for testing mixed workload vs pure OLTP and OLAP
 workload.
 
+Runs are cached in a manifest: a run is keyed by the rendered config,
+the oltpbench build and the storage variant, and only missing or stale
+runs are executed. The raw files and their parsed summaries are kept in
+the results directory, one subdirectory per key.
+
 Usage:
- ./run_mix_vs_single [--no-test]
+ ./run_mix_vs_single [--no-test] [--force] [--variant=<name>] [--split-ratio=<permille>] [--results=<dir>]
  ./run_mix_vs_single -h | --help
 
 Options:
-    --no-test       Don't run oltpbenchmark,
-                    use existing saved .res files.
+    --no-test                   Don't run oltpbenchmark,
+                                use the cached results only.
+    --force                     Run every config even if it is cached.
+    --variant=<name>            Storage variant under test (netCAS,
+                                openCAS, MF, ...) [default: netCAS].
+    --split-ratio=<permille>    netCAS split ratio, read from the
+                                netcas_knob module if not given.
+    --results=<dir>             Result cache, relative to the oltpbench
+                                directory [default: results/mix_vs_single].
     -h --help     Show this screen.
 """
 from subprocess import check_call
 from contextlib import contextmanager
+import hashlib
+import json
 import os
 import sys
+import time
+import xml.etree.ElementTree as ElementTree
 import pylab as p
 import shutil
 
@@ -28,6 +44,14 @@ except ImportError:
 PATH_TO_OLTP = ".."
 PATH_TO_PLOTTER = os.path.abspath("plot/")
 sys.path.insert(0, PATH_TO_PLOTTER)
+SPLIT_RATIO_KNOB = "/sys/module/netcas_knob/parameters/split_ratio_permille"
+# Bumped when summarize() changes, older summaries are rewritten
+SUMMARY_VERSION = 3
+# Share of the configured rate a run has to reach for coordinated omission
+# corrected latencies to be reported
+SUSTAINED_RATE = 0.9
+BENCHMARK_ARGS = ['--create=false', '--load=false', '--execute=true',
+                  '-s', "5", '--histograms']
 
 
 TEMPLATE = """<?xml version="1.0"?>
@@ -161,7 +185,9 @@ CHBENCHMARK_QUERIES = """
     </transactiontypes> 
 """
 
-from plot_latencies import ThroughputExtractor, LatencyExtractor
+from plot_latencies import ThroughputExtractor, LatencyExtractor, \
+        LATENCY_PERCENTILES
+import interference
 
 class WorkloadConfig(object):
     """Contains information on workload"""
@@ -210,21 +236,186 @@ CONFIGS = {'TPCC': WorkloadConfig('tpcc',
 
 
 def run_test(name, config):
-    """Runs tpcc and returns throughput and latency extractor objects"""
+    """Runs tpcc and returns the path of the raw output"""
 
     with config.create_config() as config_path:
         check_call(["./oltpbenchmark",
                         '-b', config.workloads,
                         '-c', config_path,
-                        '--create=false',
-                        '--load=false',
-                        '--execute=true',
-                        '-s', "5",
                         '-o', 'output',
-                        '--histograms',
-                        ])
+                        ] + BENCHMARK_ARGS)
 
         shutil.copyfile("output.raw", name + ".raw")
+    return name + ".raw"
+
+
+def build_fingerprint():
+    """Returns a hash of the compiled oltpbench classes and libraries"""
+    digest = hashlib.sha1()
+    for top in ("build/classes", "lib"):
+        for directory, subdirs, files in sorted(os.walk(top)):
+            subdirs.sort()
+            for filename in sorted(files):
+                path = os.path.join(directory, filename)
+                digest.update(path.encode("utf-8"))
+                with open(path, "rb") as data:
+                    for block in iter(lambda: data.read(1 << 20), b""):
+                        digest.update(block)
+    return digest.hexdigest()
+
+
+def storage_variant(arguments):
+    """Returns the storage variant the runs are made on"""
+    split_ratio = arguments.get("--split-ratio")
+    if split_ratio is None and os.path.exists(SPLIT_RATIO_KNOB):
+        with open(SPLIT_RATIO_KNOB) as knob:
+            split_ratio = knob.read().strip()
+    if split_ratio is not None:
+        split_ratio = int(split_ratio)
+    return {'variant': arguments.get("--variant") or "netCAS",
+            'split_ratio': split_ratio}
+
+
+def summarize(raw_path, rate=None, limited=None):
+    """Returns the per query latency statistics and the throughput of a
+    raw file. With the rate limit of the run, the transaction types in the
+    limited range also get their coordinated omission corrected
+    percentiles, as long as the run kept up with the rate."""
+    latency = LatencyExtractor(raw_path)
+    percentiles = ['p%s' % percentile for percentile in LATENCY_PERCENTILES]
+    columns = ['count', 'mean', 'min', 'max', 'std'] + percentiles
+    queries = {}
+    for row in latency.extract():
+        queries[str(int(row[0]))] = dict(zip(columns, row[1:].tolist()))
+    start = latency.raw['start']
+    duration = float(start.max() - start.min()) if len(start) else 0.0
+    summary = {'samples': len(latency.raw),
+               'duration': duration,
+               'throughput': len(latency.raw) / duration if duration else 0.0,
+               'latency_unit': 's',
+               'queries': queries}
+
+    if rate and limited:
+        first, last = limited
+        count = int(((latency.raw['type'] >= first) &
+                     (latency.raw['type'] <= last)).sum())
+        achieved = count / duration if duration else 0.0
+        # Below the rate the schedule falls further behind with every
+        # request, corrected latencies would measure the run length
+        sustained = achieved >= SUSTAINED_RATE * rate
+        summary['rate'] = {'configured': rate,
+                           'achieved': achieved,
+                           'sustained': sustained}
+        if sustained:
+            columns = ['corrected_' + name for name in percentiles]
+            for row in latency.extract_corrected(rate, limited):
+                queries[str(int(row[0]))].update(
+                        zip(columns, row[2 + len(percentiles):].tolist()))
+    return summary
+
+
+class ResultCache(object):
+    """Manifest of the runs in a results directory
+
+    Every run is stored under <directory>/<key>/ where key hashes
+    everything that determines its outcome: the rendered config, the
+    oltpbench arguments and build, and the storage variant. The manifest
+    records the parameters and the raw file's size and mtime, so a run whose
+    raw file was removed or replaced is run again.
+    """
+    MANIFEST = "manifest.json"
+
+    def __init__(self, directory, build):
+        self.directory = directory
+        self.build = build
+        self.path = os.path.join(directory, self.MANIFEST)
+        self.runs = {}
+        if os.path.exists(self.path):
+            with open(self.path) as manifest:
+                self.runs = json.load(manifest)['runs']
+
+    def key(self, name, config, variant):
+        """Returns the key of config run on variant"""
+        digest = hashlib.sha1()
+        for part in (name, config.workloads, config._get_config(),
+                     " ".join(BENCHMARK_ARGS), self.build,
+                     json.dumps(variant, sort_keys=True)):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()[:16]
+
+    def lookup(self, key):
+        """Returns the manifest entry of key, None if missing or stale"""
+        entry = self.runs.get(key)
+        if entry is None:
+            return None
+        raw_path = os.path.join(self.directory, entry['raw'])
+        if not os.path.exists(raw_path):
+            return None
+        stat = os.stat(raw_path)
+        if stat.st_size != entry['raw_size'] or \
+                int(stat.st_mtime) != entry['raw_mtime']:
+            return None
+        if entry.get('summary_version') != SUMMARY_VERSION or \
+                not os.path.exists(os.path.join(self.directory,
+                                                entry['summary'])):
+            self._write_summary(entry)
+            self.save()
+        return entry
+
+    def store(self, key, name, config, variant, raw_path):
+        """Moves a raw file into the cache and records it"""
+        run_directory = os.path.join(self.directory, key)
+        if not os.path.isdir(run_directory):
+            os.makedirs(run_directory)
+        raw = os.path.join(key, name + ".raw")
+        shutil.move(raw_path, os.path.join(self.directory, raw))
+        stat = os.stat(os.path.join(self.directory, raw))
+
+        parameters = ElementTree.fromstring(config._get_config())
+        entry = {'name': name,
+                 'workloads': config.workloads,
+                 'scalefactor': parameters.findtext('scalefactor'),
+                 'terminals': dict((terminals.get('bench', ''),
+                                    terminals.text)
+                                   for terminals in parameters.iter('terminals')),
+                 'time': config.TIME,
+                 'rate': config.RATE,
+                 'arguments': BENCHMARK_ARGS,
+                 'build': self.build,
+                 'created': time.strftime("%Y-%m-%d %H:%M:%S"),
+                 'raw': raw,
+                 'raw_size': stat.st_size,
+                 'raw_mtime': int(stat.st_mtime),
+                 'summary': os.path.join(key, name + ".summary.json")}
+        entry.update(variant)
+        self._write_summary(entry)
+        self.runs[key] = entry
+        self.save()
+        return entry
+
+    def _write_summary(self, entry):
+        config = CONFIGS.get(entry['name'])
+        limited = None
+        if config is not None:
+            limited = config.query_ranges.get('OLTP')
+        with open(os.path.join(self.directory, entry['summary']), 'w') as output:
+            json.dump(summarize(os.path.join(self.directory, entry['raw']),
+                                entry['rate'], limited),
+                      output, indent=1, sort_keys=True)
+        entry['summary_version'] = SUMMARY_VERSION
+
+    def summary(self, entry):
+        """Returns the parsed summary of a run"""
+        with open(os.path.join(self.directory, entry['summary'])) as data:
+            return json.load(data)
+
+    def save(self):
+        """Writes the manifest, atomically so an interrupted sweep can resume"""
+        temporary = self.path + ".tmp"
+        with open(temporary, 'w') as manifest:
+            json.dump({'runs': self.runs}, manifest, indent=1, sort_keys=True)
+        os.rename(temporary, self.path)
 
 
 def create_latency_diagrams(data):
@@ -271,6 +462,23 @@ def create_throughput_diagrams(data):
     p.show()
 
 
+def create_interference_report(data, variant):
+    """Writes the throughput loss and tail latency inflation of every TPCC
+    transaction while each CH query runs to interference.csv"""
+    label = variant['variant']
+    if variant['split_ratio'] is not None:
+        label = "%s@%d" % (label, variant['split_ratio'])
+    with open("interference.csv", 'w') as output:
+        results = interference.report(
+                [(label, data['MIXED']['LATENCY'].filename,
+                  data['TPCC']['LATENCY'].filename)],
+                output,
+                CONFIGS['MIXED'].query_ranges['OLTP'],
+                CONFIGS['MIXED'].query_ranges['OLAP'])
+    for query, loss in interference.worst_queries(results)[label]:
+        print "%s: %.1f%% OLTP throughput loss" % (query, loss * 100)
+
+
 @contextmanager
 def chdir(dest):
     """To the dest and back again"""
@@ -292,15 +500,32 @@ def main():
         print __doc__
         sys.exit(0)
     with chdir(PATH_TO_OLTP):
+        cache = ResultCache(arguments.get("--results") or
+                                "results/mix_vs_single",
+                            build_fingerprint())
+        variant = storage_variant(arguments)
         results = {}
         for name, config in CONFIGS.items():
-            if not arguments.get("--no-test"):
-                run_test(name, config)
-            results[name] = {'LATENCY': LatencyExtractor(name + ".raw"),
-                            'THROUGHPUT': ThroughputExtractor(name + ".raw")}
+            key = cache.key(name, config, variant)
+            entry = cache.lookup(key)
+            if entry is None or arguments.get("--force"):
+                if arguments.get("--no-test"):
+                    print "No cached run of %s on %s, run without --no-test" % (
+                            name, variant['variant'])
+                    sys.exit(1)
+                entry = cache.store(key, name, config, variant,
+                                    run_test(name, config))
+            else:
+                print "%s: using cached run %s from %s" % (name, key,
+                                                          entry['created'])
+            raw_path = os.path.join(cache.directory, entry['raw'])
+            results[name] = {'LATENCY': LatencyExtractor(raw_path),
+                            'THROUGHPUT': ThroughputExtractor(raw_path),
+                            'SUMMARY': cache.summary(entry)}
 
         create_latency_diagrams(results)
         create_throughput_diagrams(results)
+        create_interference_report(results, variant)
 
     raw_input("Press enter to EXIT")
     sys.exit(0)
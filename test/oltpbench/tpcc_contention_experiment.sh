@@ -18,6 +18,7 @@ SCALE_FACTOR=1
 EXPERIMENT_NAME="tpcc_orthus-cas_contention_ver2_8"
 BASE_OUTPUT_DIR="/home/chanseo/oltpbench/results/$EXPERIMENT_NAME"
 SAMPLE_INTERVAL=1
+split_ratio_plot_script="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)/../graph/split_ratio_plot.py"
 
 # Create base output directory
 mkdir -p $BASE_OUTPUT_DIR
@@ -117,99 +118,17 @@ extract_split_ratio_data() {
     echo "Mode data extracted to $mode_file"
 }
 
-# Function to generate split ratio and mode graphs
+# Function to generate split ratio and mode graphs for every test under a directory
+# All timelines are rendered by one renderer process instead of one python3 per test
 generate_split_ratio_graphs() {
-    local output_dir="$1"
-    local test_id="$2"
-    local split_ratio_file="$output_dir/${test_id}_split_ratio.txt"
-    local split_ratio_plot_png="$output_dir/${test_id}_split_ratio.png"
-    local python_script="$output_dir/${test_id}_split_ratio.py"
-
-    if [ ! -f "$split_ratio_file" ] || [ ! -s "$split_ratio_file" ]; then
-        echo "Error: Split ratio data file $split_ratio_file does not exist or is empty. Skipping graph generation."
-        return 1
-    fi
-
-    echo "Generating split ratio and mode graphs for $test_id..."
-
-    # Create Python script for split ratio with mode changes
-    cat > "$python_script" << EOL
-import matplotlib.pyplot as plt
-import numpy as np
-import sys
-
-# Read split ratio data
-try:
-    data = np.loadtxt('${test_id}_split_ratio.txt')
-    time_indices = data[:, 0]  # Time in seconds
-    modes = data[:, 1]         # Mode values
-    split_ratios = data[:, 2]  # Split ratio values
-except Exception as e:
-    print(f"Error: Could not read split ratio data: {e}")
-    sys.exit(1)
-
-# Find mode changes from the data
-mode_changes_x = []
-mode_changes_y = []
-prev_mode = None
-for i, (time_val, mode_val) in enumerate(zip(time_indices, modes)):
-    if prev_mode is not None and mode_val != prev_mode:
-        mode_changes_x.append(time_val)
-        mode_changes_y.append(mode_val)
-    prev_mode = mode_val
-
-# Create the plot
-fig, ax1 = plt.subplots(figsize=(12, 8))
-
-# Plot split ratio
-ax1.plot(time_indices, split_ratios, 'b-', linewidth=2, label='Split Ratio (%)')
-ax1.set_xlabel('Time (seconds)')
-ax1.set_ylabel('Split Ratio (%)', color='b')
-ax1.tick_params(axis='y', labelcolor='b')
-ax1.set_ylim(0, 100)  # Y축을 0~100으로 고정
-ax1.grid(True, alpha=0.3)
-
-# Add vertical dashed lines for mode changes
-for i, (x, y) in enumerate(zip(mode_changes_x, mode_changes_y)):
-    ax1.axvline(x=x, color='red', linestyle='--', linewidth=2, alpha=0.7)
-    ax1.text(x, max(split_ratios) * 0.95, f'Mode {y}', rotation=90, 
-             verticalalignment='top', horizontalalignment='right', 
-             color='red', fontsize=10, fontweight='bold')
-
-# Create second y-axis for mode changes
-ax2 = ax1.twinx()
-if mode_changes_x:
-    ax2.scatter(mode_changes_x, mode_changes_y, color='red', s=100, 
-                label='Mode Changes', zorder=5)
-ax2.set_ylabel('Mode', color='r')
-ax2.tick_params(axis='y', labelcolor='r')
-ax2.set_ylim(0, max(mode_changes_y) + 1 if mode_changes_y else 1)
-
-# Set title and legend
-plt.title('Split Ratio and Mode Changes - $test_id (0.1s resolution)', fontsize=14, fontweight='bold')
-ax1.legend(loc='upper left')
-if mode_changes_x:
-    ax2.legend(loc='upper right')
+    local results_dir="$1"
 
-# Adjust layout and save
-plt.tight_layout()
-plt.savefig('${test_id}_split_ratio.png', dpi=300, bbox_inches='tight')
-plt.close()
+    echo "Generating split ratio and mode graphs under $results_dir..."
 
-print("Split ratio graph saved to ${test_id}_split_ratio.png")
-EOL
-    
-    # Run Python script from the output directory
-    cd "$output_dir"
-    python3 "$python_script"
-    if [ $? -eq 0 ]; then
-        echo "Split ratio graph saved to $split_ratio_plot_png"
+    if python3 "$split_ratio_plot_script" "$results_dir" --ylim 0 100; then
+        echo "Split ratio graphs saved under $results_dir"
     else
-        echo "Error: Failed to generate split ratio graph"
-        echo "Python script location: $python_script"
-        echo "Current directory: $(pwd)"
-        echo "Files in directory:"
-        ls -la
+        echo "Error: Failed to generate some split ratio graphs"
     fi
 }
 
@@ -421,9 +340,6 @@ run_single_tpcc_test() {
     # Extract split ratio and mode data from dmesg
     extract_split_ratio_data "$output_dir" "$test_id"
     
-    # Generate split ratio and mode graphs
-    generate_split_ratio_graphs "$output_dir" "$test_id"
-    
     # Generate throughput vs time graph
     generate_throughput_graph "$output_dir" "$test_id"
     
@@ -460,6 +376,10 @@ echo "test_id,terminals,throughput" > "$BASE_OUTPUT_DIR/results_summary.txt"
 total_tests=${#TERMINALS_LIST[@]}
 current_test=0
 
+# If the sweep fails or is interrupted, still render the timelines of the finished tests
+trap 'generate_split_ratio_graphs "$BASE_OUTPUT_DIR"' EXIT
+trap 'exit 130' INT TERM
+
 # Loop through all terminals configurations
 for terminals in "${TERMINALS_LIST[@]}"; do
     current_test=$((current_test + 1))
@@ -473,6 +393,10 @@ for terminals in "${TERMINALS_LIST[@]}"; do
     sleep 5
 done
 
+# Generate split ratio and mode graphs for all tests in one pass
+trap - EXIT INT TERM
+generate_split_ratio_graphs "$BASE_OUTPUT_DIR"
+
 echo ""
 echo "=========================================="
 echo "All TPCC contention tests completed!"
@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Finds the split ratio with the highest TPCC throughput without sweeping
+every ratio like tpcc_experiment.sh.
+
+Throughput over split_ratio_permille is treated as a noisy unimodal
+function and searched with golden-section search. While the bracket is
+wide one run per ratio is enough to decide which side to drop; once it is
+narrower than --refine-width, the two inner ratios are measured again until
+their 95% confidence intervals separate (or --max-repeats is reached).
+The search stops when the bracket is down to --resolution or after
+--max-runs runs, typically 10-15 runs instead of 101.
+
+Every run is set up exactly like tpcc_experiment.sh does (ratio knob,
+casadm -Z, terminals in a copy of the config) and its .csv/.res/log are
+stored under results/<name>/ with the same names, plus _rep<N> for
+repeated measurements. terminals<T>_search.csv lists every measurement.
+
+Usage:
+  ./tpcc_ratio_search.py --terminals 32
+  ./tpcc_ratio_search.py --terminals 8 16 --low 0 --high 10000 --max-runs 15
+  ./tpcc_ratio_search.py --simulate      # try the search on a synthetic curve
+"""
+from __future__ import print_function
+
+import argparse
+import math
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import time
+
+RATIO_KNOB = "/sys/module/netcas_knob/parameters/split_ratio_permille"
+GOLDEN = (math.sqrt(5) - 1) / 2
+JAVA_CLASSPATH = "target/oltpbench-1.0-jar-with-dependencies.jar:mysql-connector-java-8.0.30.jar"
+
+
+# 97.5% quantiles of Student's t for df 1-5, where the expansion below is poor
+T_975 = {1: 12.706205, 2: 4.302653, 3: 3.182446, 4: 2.776445, 5: 2.570582}
+
+
+def t_quantile_975(df):
+    """Returns the 97.5% quantile of Student's t with df degrees of freedom
+    (tabulated for df <= 5, Cornish-Fisher expansion above: within 0.06%)"""
+    if df in T_975:
+        return T_975[df]
+    z = 1.959964
+    df = float(df)
+    return (z + (z ** 3 + z) / (4 * df) +
+            (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2) +
+            (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * df ** 3))
+
+
+class Measurements(object):
+    """Throughput samples per ratio"""
+
+    def __init__(self):
+        self.samples = {}
+
+    def add(self, ratio, throughput):
+        self.samples.setdefault(ratio, []).append(throughput)
+
+    def count(self, ratio):
+        return len(self.samples.get(ratio, []))
+
+    def mean(self, ratio):
+        values = self.samples[ratio]
+        return sum(values) / float(len(values))
+
+    def interval(self, ratio):
+        """Returns the 95% confidence interval of the mean throughput"""
+        values = self.samples[ratio]
+        mean = self.mean(ratio)
+        if len(values) < 2:
+            return mean, mean
+        var = sum((v - mean) ** 2 for v in values) / (len(values) - 1)
+        half = t_quantile_975(len(values) - 1) * math.sqrt(var / len(values))
+        return mean - half, mean + half
+
+    def separated(self, a, b):
+        """True once a and b both have repeats and their intervals do not overlap"""
+        if self.count(a) < 2 or self.count(b) < 2:
+            return False
+        low_a, high_a = self.interval(a)
+        low_b, high_b = self.interval(b)
+        return high_a < low_b or high_b < low_a
+
+
+class Experiment(object):
+    """Runs TPCC once per call at a given ratio, like tpcc_experiment.sh"""
+
+    def __init__(self, args, terminals):
+        self.args = args
+        self.terminals = terminals
+        self.results_dir = os.path.join("results", args.name)
+        self.log_dir = os.path.join(self.results_dir, "logs")
+        self.terminals_dir = os.path.join(self.results_dir,
+                                          "terminals%d" % terminals)
+        for path in (self.log_dir, self.terminals_dir):
+            if not os.path.isdir(path):
+                os.makedirs(path)
+        self.repeats = {}
+
+    def run(self, ratio):
+        repeat = self.repeats.get(ratio, 0) + 1
+        self.repeats[ratio] = repeat
+        name = "tpcc_terminals%d_ratio%d" % (self.terminals, ratio)
+        if repeat > 1:
+            name += "_rep%d" % repeat
+        print("실험: Terminals=%d, Ratio=%d (run %d)" % (self.terminals, ratio, repeat))
+
+        subprocess.check_call("echo %d | sudo tee %s > /dev/null" % (ratio, RATIO_KNOB),
+                              shell=True)
+        time.sleep(2)
+        if subprocess.call(["sudo", "casadm", "-Z", "-i", "1"]) != 0:
+            print("Warning: casadm reset failed, continuing...")
+        time.sleep(2)
+
+        config_file = "config/tpcc_config_mysql_temp.xml"
+        with open(self.args.config) as template:
+            config = template.read()
+        with open(config_file, "w") as output:
+            output.write(re.sub(r"<terminals>[0-9]*</terminals>",
+                                "<terminals>%d</terminals>" % self.terminals, config))
+
+        log_file = os.path.join(self.log_dir, name + ".log")
+        with open(log_file, "w") as log:
+            subprocess.call(["java", "-Dlog4j.configuration=log4j.properties",
+                             "-cp", JAVA_CLASSPATH, "com.oltpbenchmark.DBWorkload",
+                             "-b", "tpcc", "-c", config_file, "--execute=true",
+                             "-s", str(self.args.scale_factor), "-o", name],
+                            stdout=log, stderr=subprocess.STDOUT)
+        time.sleep(10)
+        os.remove(config_file)
+
+        for extension in (".csv", ".res"):
+            source = os.path.join("results", name + extension)
+            if os.path.exists(source):
+                shutil.move(source, os.path.join(self.terminals_dir, name + extension))
+        res_file = os.path.join(self.terminals_dir, name + ".res")
+        if not os.path.exists(res_file):
+            raise RuntimeError("실험 실패: %s was not created, see %s" % (res_file, log_file))
+        return res_throughput(res_file)
+
+
+def res_throughput(path):
+    """Returns the mean of the throughput column of a .res file"""
+    values = []
+    with open(path) as res:
+        next(res)
+        for line in res:
+            parts = line.split(",")
+            if len(parts) > 1 and parts[1].strip():
+                values.append(float(parts[1]))
+    if not values:
+        raise RuntimeError("%s has no throughput samples" % path)
+    return sum(values) / len(values)
+
+
+class Simulation(object):
+    """Stands in for Experiment: a noisy unimodal throughput curve"""
+
+    def __init__(self, args, terminals):
+        self.best = random.uniform(args.low, args.high)
+        self.width = (args.high - args.low) / 2.0
+        self.noise = args.simulate_noise
+
+    def run(self, ratio):
+        peak = 1000.0 * math.exp(-((ratio - self.best) / self.width) ** 2)
+        return max(peak + random.gauss(0, self.noise), 0.0)
+
+
+class GoldenSectionSearch(object):
+    """Golden-section search over integer ratios with repeated measurements
+    only where the bracket got narrow"""
+
+    def __init__(self, experiment, args):
+        self.experiment = experiment
+        self.args = args
+        self.measurements = Measurements()
+        self.runs = 0
+        self.log = []
+
+    def measure(self, ratio):
+        throughput = self.experiment.run(ratio)
+        self.runs += 1
+        self.measurements.add(ratio, throughput)
+        self.log.append((ratio, self.measurements.count(ratio), throughput))
+        print("  ratio %5d: %.2f req/s (mean %.2f over %d runs)" % (
+            ratio, throughput, self.measurements.mean(ratio), self.measurements.count(ratio)))
+        return throughput
+
+    def ensure(self, ratio):
+        if not self.measurements.count(ratio):
+            self.measure(ratio)
+
+    def budget(self):
+        return self.runs < self.args.max_runs
+
+    def compare(self, c, d, narrow):
+        """Returns True if c looks better than d, measuring again when narrow"""
+        m = self.measurements
+        while narrow and self.budget() and not m.separated(c, d) and \
+                max(m.count(c), m.count(d)) < self.args.max_repeats:
+            # Repeat the less measured side first
+            self.measure(c if m.count(c) <= m.count(d) else d)
+        return m.mean(c) >= m.mean(d)
+
+    def search(self):
+        low, high = self.args.low, self.args.high
+        c = int(round(high - GOLDEN * (high - low)))
+        d = int(round(low + GOLDEN * (high - low)))
+        while high - low > self.args.resolution and self.budget():
+            self.ensure(c)
+            if not self.budget():
+                break
+            self.ensure(d)
+            narrow = high - low <= self.args.refine_width
+            if c == d:
+                break
+            if self.compare(c, d, narrow):
+                high = d
+                d = c
+                c = int(round(high - GOLDEN * (high - low)))
+            else:
+                low = c
+                c = d
+                d = int(round(low + GOLDEN * (high - low)))
+
+        measured = [r for r in self.measurements.samples if low <= r <= high]
+        if not measured:
+            measured = list(self.measurements.samples)
+        best = max(measured, key=self.measurements.mean)
+        return best, (low, high)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--terminals", type=int, nargs="+", default=[32])
+    parser.add_argument("--low", type=int, default=0, help="lowest ratio (permille x10)")
+    parser.add_argument("--high", type=int, default=10000, help="highest ratio")
+    parser.add_argument("--resolution", type=int, default=100,
+                        help="stop when the bracket is this narrow (the old sweep step)")
+    parser.add_argument("--refine-width", type=int, default=2000,
+                        help="repeat measurements once the bracket is this narrow")
+    parser.add_argument("--max-repeats", type=int, default=3,
+                        help="runs per ratio before giving up on separating two ratios")
+    parser.add_argument("--max-runs", type=int, default=15, help="runs per terminal count")
+    parser.add_argument("--config", default="config/tpcc_config_mysql.xml")
+    parser.add_argument("--scale-factor", type=int, default=1,
+                        help="oltpbench -s (sampling window of the .res file)")
+    parser.add_argument("--name", default="tpcc_ratio_search", help="results/<name>")
+    parser.add_argument("--simulate", action="store_true",
+                        help="search a synthetic noisy curve instead of running TPCC")
+    parser.add_argument("--simulate-noise", type=float, default=20.0)
+    args = parser.parse_args()
+
+    for terminals in args.terminals:
+        print("=== Terminals: %d 실험 시작 ===" % terminals)
+        if args.simulate:
+            experiment = Simulation(args, terminals)
+        else:
+            experiment = Experiment(args, terminals)
+        search = GoldenSectionSearch(experiment, args)
+        best, bracket = search.search()
+
+        low, high = search.measurements.interval(best)
+        print("=== Terminals: %d: best ratio %d, %.2f req/s (95%% CI %.2f-%.2f, %d runs), "
+              "bracket %d-%d, %d runs in total ===" % (
+                  terminals, best, search.measurements.mean(best), low, high,
+                  search.measurements.count(best), bracket[0], bracket[1], search.runs))
+        if args.simulate:
+            print("    (synthetic optimum at %.0f)" % experiment.best)
+            continue
+        summary = os.path.join(experiment.results_dir, "terminals%d_search.csv" % terminals)
+        with open(summary, "w") as output:
+            output.write("ratio,repeat,throughput\n")
+            for ratio, repeat, throughput in search.log:
+                output.write("%d,%d,%f\n" % (ratio, repeat, throughput))
+        print("측정 결과: %s" % summary)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
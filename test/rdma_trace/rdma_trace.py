@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+RDMA Metrics Trace Tool
+Records, converts and replays /sys/kernel/rdma_metrics samples so netCAS
+tooling can be developed without the NVMe-oF RDMA testbed
+"""
+
+import os
+import re
+import sys
+import time
+import struct
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+# Trace file layout (little endian):
+#   header:  magic(8s) version(H) flags(H) interval_us(I) start_ns(Q) count(Q)
+#   records: dt_us(I) throughput_mbps(I) latency_us(I)
+# dt_us is the delta to the previous sample (0 for the first one), so a
+# sample costs 12 bytes regardless of the trace length.
+TRACE_MAGIC = b'RDMATRC1'
+TRACE_VERSION = 1
+HEADER_FORMAT = '<8sHHIQQ'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+RECORD_FORMAT = '<III'
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+RECORD_DTYPE = np.dtype([('dt_us', '<u4'), ('throughput', '<u4'), ('latency', '<u4')])
+U32_MAX = 0xFFFFFFFF
+
+# The patched nvme-rdma driver aggregates completions every 100 ms
+DEFAULT_INTERVAL = 0.1
+SYSFS_ROOT = '/sys/kernel/rdma_metrics'
+DEFAULT_REPLAY_ROOT = '/dev/shm/rdma_metrics'
+METRIC_FILES = ('throughput', 'latency')
+
+# [ 1234.567890] [RDMA-METRICS] Throughput: 2149 MB/s | Avg Latency: 351 us
+RDMA_LOG_PATTERN = re.compile(
+    r'(?:\[\s*(?P<ts>\d+\.\d+)\]\s*)?\[RDMA-METRICS\] Throughput: (?P<tput>\d+) MB/s \| Avg Latency: (?P<lat>\d+) us')
+
+
+class RDMATrace:
+    """In-memory RDMA metrics trace: sample times (s) plus throughput/latency columns"""
+
+    def __init__(self, times, throughput, latency, start_ns=0, interval=DEFAULT_INTERVAL):
+        self.times = np.asarray(times, dtype=np.float64)
+        self.throughput = np.asarray(throughput, dtype=np.uint32)
+        self.latency = np.asarray(latency, dtype=np.uint32)
+        self.start_ns = int(start_ns)
+        self.interval = interval
+
+    def __len__(self):
+        return len(self.times)
+
+    @property
+    def duration(self):
+        return float(self.times[-1]) if len(self.times) else 0.0
+
+    @classmethod
+    def load(cls, path):
+        """Load a binary trace file"""
+        with open(path, 'rb') as f:
+            raw = f.read()
+        if len(raw) < HEADER_SIZE:
+            raise ValueError(f"{path}: file too short for a trace header")
+        magic, version, _flags, interval_us, start_ns, _count = struct.unpack_from(HEADER_FORMAT, raw)
+        if magic != TRACE_MAGIC:
+            raise ValueError(f"{path}: not an RDMA metrics trace")
+        if version != TRACE_VERSION:
+            raise ValueError(f"{path}: unsupported trace version {version}")
+
+        # Ignore a trailing partial record left by an interrupted recording
+        usable = (len(raw) - HEADER_SIZE) // RECORD_SIZE * RECORD_SIZE
+        records = np.frombuffer(raw, dtype=RECORD_DTYPE, count=usable // RECORD_SIZE, offset=HEADER_SIZE)
+        times = np.cumsum(records['dt_us'], dtype=np.uint64) / 1e6
+        return cls(times, records['throughput'], records['latency'], start_ns, interval_us / 1e6)
+
+    def save(self, path):
+        """Write the trace as a binary trace file"""
+        records = np.empty(len(self), dtype=RECORD_DTYPE)
+        micros = np.round(self.times * 1e6).astype(np.int64)
+        records['dt_us'] = np.clip(np.diff(micros, prepend=micros[:1]), 0, U32_MAX)
+        records['throughput'] = self.throughput
+        records['latency'] = self.latency
+        with open(path, 'wb') as f:
+            f.write(struct.pack(HEADER_FORMAT, TRACE_MAGIC, TRACE_VERSION, 0,
+                                int(round(self.interval * 1e6)), self.start_ns, len(self)))
+            f.write(records.tobytes())
+
+    @classmethod
+    def from_kernel_log(cls, path):
+        """Build a trace from dmesg output containing [RDMA-METRICS] lines"""
+        times, throughput, latency = [], [], []
+        with open(path, 'r', errors='replace') as f:
+            for line in f:
+                match = RDMA_LOG_PATTERN.search(line)
+                if not match:
+                    continue
+                times.append(float(match.group('ts')) if match.group('ts') else np.nan)
+                throughput.append(int(match.group('tput')))
+                latency.append(int(match.group('lat')))
+
+        if not times:
+            raise ValueError(f"{path}: no [RDMA-METRICS] lines found")
+
+        times = np.array(times)
+        if np.isnan(times).any():
+            # dmesg without timestamps: assume the driver's 100 ms cadence
+            times = np.arange(len(times)) * DEFAULT_INTERVAL
+        else:
+            times = times - times[0]
+        return cls(times, throughput, latency)
+
+    @classmethod
+    def from_csv(cls, path):
+        """Build a trace from a time_s,throughput,latency CSV (header optional)"""
+        data = np.genfromtxt(path, delimiter=',', comments='#', invalid_raise=False)
+        data = np.atleast_2d(data)
+        data = data[~np.isnan(data).any(axis=1)]
+        if data.size == 0 or data.shape[1] < 3:
+            raise ValueError(f"{path}: expected time_s,throughput,latency columns")
+        return cls(data[:, 0] - data[0, 0], data[:, 1], data[:, 2])
+
+    def to_csv(self, out):
+        out.write("time_s,throughput_mbps,latency_us\n")
+        for t, tput, lat in zip(self.times, self.throughput, self.latency):
+            out.write(f"{t:.6f},{tput},{lat}\n")
+
+
+class TraceRecorder:
+    """Streams samples read from a live rdma_metrics directory into a trace file"""
+
+    def __init__(self, path, interval=DEFAULT_INTERVAL):
+        self.file = open(path, 'wb')
+        self.interval = interval
+        self.start_ns = time.time_ns()
+        self.last_us = None
+        self.count = 0
+        self.file.write(struct.pack(HEADER_FORMAT, TRACE_MAGIC, TRACE_VERSION, 0,
+                                    int(round(interval * 1e6)), self.start_ns, 0))
+
+    def append(self, elapsed, throughput, latency):
+        now_us = int(round(elapsed * 1e6))
+        dt_us = 0 if self.last_us is None else min(max(now_us - self.last_us, 0), U32_MAX)
+        self.file.write(struct.pack(RECORD_FORMAT, dt_us, min(throughput, U32_MAX), min(latency, U32_MAX)))
+        self.last_us = now_us
+        self.count += 1
+
+    def close(self):
+        # Patch the final sample count into the header
+        self.file.seek(struct.calcsize('<8sHHIQ'))
+        self.file.write(struct.pack('<Q', self.count))
+        self.file.close()
+
+
+class MetricsTree:
+    """A file tree that looks like /sys/kernel/rdma_metrics, updated in place
+
+    Values are rewritten at offset 0 and the file is truncated afterwards, so
+    readers that keep the file open and re-read it (like sysfs consumers do)
+    always see a complete first line.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.fds = {}
+        for name in METRIC_FILES:
+            self.fds[name] = os.open(self.root / name, os.O_RDWR | os.O_CREAT, 0o644)
+
+    def update(self, throughput, latency):
+        for name, value in (('throughput', throughput), ('latency', latency)):
+            data = b'%d\n' % value
+            os.pwrite(self.fds[name], data, 0)
+            os.ftruncate(self.fds[name], len(data))
+
+    def close(self):
+        for fd in self.fds.values():
+            os.close(fd)
+        self.fds = {}
+
+
+def read_metrics(root):
+    """Read throughput and latency from an rdma_metrics directory"""
+    values = []
+    for name in METRIC_FILES:
+        with open(os.path.join(root, name), 'rb') as f:
+            values.append(int(f.readline() or 0))
+    return values
+
+
+def record(args):
+    if not os.path.isdir(args.source):
+        print(f"Error: {args.source} does not exist (is the patched nvme-rdma module loaded?)")
+        return 1
+
+    recorder = TraceRecorder(args.output, args.interval)
+    print(f"Recording {args.source} every {args.interval}s to {args.output} (Ctrl-C to stop)")
+    start = time.monotonic()
+    tick = 0
+    try:
+        while args.duration is None or time.monotonic() - start < args.duration:
+            throughput, latency = read_metrics(args.source)
+            recorder.append(time.monotonic() - start, throughput, latency)
+            tick += 1
+            # Sleep to the absolute schedule so the sample rate does not drift
+            delay = start + tick * args.interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        recorder.close()
+    print(f"Recorded {recorder.count} samples")
+    return 0
+
+
+def replay(args):
+    trace = RDMATrace.load(args.trace)
+    if not len(trace):
+        print(f"Error: {args.trace} contains no samples")
+        return 1
+
+    tree = MetricsTree(args.root)
+    kmsg = open(args.kmsg_log, 'a', buffering=1) if args.kmsg_log else None
+    speed_text = 'max speed' if args.speed <= 0 else f"{args.speed}x"
+    print(f"Replaying {len(trace)} samples ({trace.duration:.1f}s) into {args.root} at {speed_text}")
+    print(f"Point consumers at it with: export RDMA_METRICS_DIR={args.root}")
+
+    # Kernel log timestamps follow trace time so the log converts back losslessly
+    log_base = 0.0
+    try:
+        while True:
+            start = time.monotonic()
+            for t, throughput, latency in zip(trace.times, trace.throughput, trace.latency):
+                if args.speed > 0:
+                    delay = start + t / args.speed - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                tree.update(throughput, latency)
+                if kmsg:
+                    kmsg.write(f"[{log_base + t:12.6f}] [RDMA-METRICS] Throughput: {throughput} MB/s | "
+                               f"Avg Latency: {latency} us\n")
+            if not args.loop:
+                break
+            log_base += trace.duration + trace.interval
+    except KeyboardInterrupt:
+        pass
+    finally:
+        tree.close()
+        if kmsg:
+            kmsg.close()
+    return 0
+
+
+def convert(args):
+    suffix = Path(args.input).suffix.lower()
+    if suffix == '.csv':
+        trace = RDMATrace.from_csv(args.input)
+    else:
+        trace = RDMATrace.from_kernel_log(args.input)
+    trace.save(args.output)
+    print(f"Wrote {len(trace)} samples ({trace.duration:.1f}s) to {args.output}")
+    return 0
+
+
+def dump(args):
+    RDMATrace.load(args.trace).to_csv(sys.stdout)
+    return 0
+
+
+def synth(args):
+    """Generate a trace following the contention experiment timeline"""
+    rng = np.random.default_rng(args.seed)
+    times = np.arange(0, args.duration, args.interval)
+    throughput = np.full(len(times), float(args.bandwidth))
+    latency = np.full(len(times), float(args.latency))
+
+    congested = (times >= args.congestion[0]) & (times < args.congestion[1])
+    throughput[congested] *= 1.0 - args.bw_drop
+    latency[congested] *= 1.0 + args.lat_inc
+
+    throughput *= 1.0 + rng.normal(0, args.noise, len(times))
+    latency *= 1.0 + rng.normal(0, args.noise, len(times))
+    trace = RDMATrace(times, np.clip(throughput, 0, U32_MAX).round(),
+                      np.clip(latency, 0, U32_MAX).round(), time.time_ns(), args.interval)
+    trace.save(args.output)
+    print(f"Wrote {len(trace)} synthetic samples to {args.output}")
+    return 0
+
+
+def parse_window(value):
+    start, end = value.split(':')
+    return float(start), float(end)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record and replay /sys/kernel/rdma_metrics traces')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('record', help='Record live rdma_metrics samples into a trace')
+    p.add_argument('output', help='Trace file to write')
+    p.add_argument('--source', default=SYSFS_ROOT, help=f'rdma_metrics directory (default: {SYSFS_ROOT})')
+    p.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help='Sampling interval in seconds')
+    p.add_argument('--duration', type=float, help='Stop after this many seconds (default: until Ctrl-C)')
+    p.set_defaults(func=record)
+
+    p = sub.add_parser('replay', help='Replay a trace into a fake rdma_metrics tree')
+    p.add_argument('trace', help='Trace file to replay')
+    p.add_argument('--root', default=DEFAULT_REPLAY_ROOT, help=f'Directory to update (default: {DEFAULT_REPLAY_ROOT})')
+    p.add_argument('--speed', type=float, default=1.0, help='Replay speed factor, 0 for as fast as possible')
+    p.add_argument('--loop', action='store_true', help='Restart from the beginning when the trace ends')
+    p.add_argument('--kmsg-log', help='Also append [RDMA-METRICS] kernel log lines to this file')
+    p.set_defaults(func=replay)
+
+    p = sub.add_parser('convert', help='Convert a dmesg log or CSV into a trace')
+    p.add_argument('input', help='dmesg output with [RDMA-METRICS] lines, or time_s,throughput,latency CSV')
+    p.add_argument('output', help='Trace file to write')
+    p.set_defaults(func=convert)
+
+    p = sub.add_parser('dump', help='Print a trace as CSV')
+    p.add_argument('trace', help='Trace file to print')
+    p.set_defaults(func=dump)
+
+    p = sub.add_parser('synth', help='Generate a synthetic congestion trace')
+    p.add_argument('output', help='Trace file to write')
+    p.add_argument('--duration', type=float, default=60.0, help='Trace length in seconds')
+    p.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help='Sample interval in seconds')
+    p.add_argument('--bandwidth', type=float, default=5120, help='Uncongested throughput in MB/s')
+    p.add_argument('--latency', type=float, default=180, help='Uncongested latency in us')
+    p.add_argument('--congestion', type=parse_window, default=(10.0, 30.0), help='Congestion window start:end in seconds')
+    p.add_argument('--bw-drop', type=float, default=0.4, help='Fractional throughput drop during congestion')
+    p.add_argument('--lat-inc', type=float, default=0.9, help='Fractional latency increase during congestion')
+    p.add_argument('--noise', type=float, default=0.02, help='Relative gaussian noise per sample')
+    p.add_argument('--seed', type=int, default=0, help='Random seed')
+    p.set_defaults(func=synth)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())